@@ -0,0 +1,195 @@
+"""Optional local ingest API for scripts (off unless "api_enabled" is set).
+
+An asyncio server on its own thread listens on 127.0.0.1:<api_port>, or on
+a Unix socket when "api_socket" is a path. The protocol is JSON lines: each
+line is one request and gets one response line.
+
+Every request carries "token": <api_token from settings.json>; the app
+generates one the first time the TCP listener starts. The Unix socket is
+owner-only and needs no token unless one is set. A line that is not a JSON
+object, or has the wrong token, gets an error and the connection is closed,
+so a browser POSTing to the port can't run its body lines.
+
+  {"op": "create", "task_name": "Deploy", "alarm_time": "2025-01-31T17:00", "priority": "High"}
+  {"op": "update", "id": "...", "task_name": "...", "alarm_time": "...", "priority": "...",
+   "recurrence": {"kind": "daily"}}
+  {"op": "snooze", "id": "...", "minutes": 10}
+  {"op": "complete", "id": "..."}
+  {"op": "delete", "id": "..."}
+  {"op": "list", "query": "deploy", "priority": "High", "status": "active", "limit": 100}
+  {"batch": [<op>, <op>, ...]}
+
+Responses are {"ok": true, "results": [...]} or {"ok": false, "error": "..."}.
+Requests run on the engine's owning thread (engine.dispatch, which the
+app makes a non-blocking queue for the Tk loop). A batch is one transaction: one persistence write
+and one on_applied() call, which the app uses for a single dashboard refresh.
+"""
+import asyncio
+import hmac
+import json
+import os
+import secrets
+import threading
+from concurrent.futures import Future
+
+DEFAULT_PORT = 47800
+MAX_LINE = 16 * 1024 * 1024
+LIST_LIMIT = 100
+STOP_TIMEOUT = 2.0   # seconds
+
+
+def new_token():
+    return secrets.token_urlsafe(24)
+
+
+class BatchServer:
+    def __init__(self, engine, port=DEFAULT_PORT, socket_path=None, on_applied=None, token=None):
+        self.engine = engine
+        self.port = port
+        self.socket_path = socket_path
+        self.on_applied = on_applied
+        self.token = token
+        self.loop = None
+        self.server = None
+        self._thread = None
+        self._ready = threading.Event()
+        self.error = None
+
+    # ========== LIFECYCLE ==========
+    def start(self):
+        """Starts listening; returns False (and prints why) if it could not."""
+        if not self.socket_path and not self.token:
+            # Any local process or web page can reach the TCP port
+            print("Error starting API server: a token is required on the TCP port")
+            return False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self.error:
+            print(f"Error starting API server: {self.error}")
+            return False
+        return True
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.server = self.loop.run_until_complete(self._listen())
+            if not self.socket_path and self.port == 0:
+                self.port = self.server.sockets[0].getsockname()[1]
+        except OSError as e:
+            self.error = e
+            self._ready.set()
+            self.loop.close()
+            return
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.server.close()
+            self.loop.run_until_complete(self.server.wait_closed())
+            self.loop.close()
+            if self.socket_path and os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    async def _listen(self):
+        if self.socket_path:
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            server = await asyncio.start_unix_server(self._handle, path=self.socket_path, limit=MAX_LINE)
+            os.chmod(self.socket_path, 0o600)
+            return server
+        return await asyncio.start_server(self._handle, "127.0.0.1", self.port, limit=MAX_LINE)
+
+    def stop(self):
+        if self.loop is not None and self._thread is not None and self._thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            # Bounded: a request handler stuck on engine.dispatch must not hold up exit
+            self._thread.join(STOP_TIMEOUT)
+            if self._thread.is_alive():
+                print("API server did not stop in time; leaving it to exit with the app")
+        self._thread = None
+
+    # ========== REQUESTS ==========
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    writer.write(b'{"ok": false, "error": "request too large"}\n')
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                request, error = self.parse(line)
+                response = error or await self.respond(request)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+                if error:
+                    break  # not a client speaking this protocol
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def parse(self, line):
+        """(request, None), or (None, error response) when the connection should close."""
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return None, {"ok": False, "error": f"invalid JSON: {e}"}
+        if not isinstance(request, dict):
+            return None, {"ok": False, "error": "request must be an object"}
+        if self.token and not hmac.compare_digest(str(request.get("token", "")).encode(), self.token.encode()):
+            return None, {"ok": False, "error": "missing or wrong token"}
+        return request, None
+
+    async def handle_request(self, line):
+        request, error = self.parse(line)
+        return error or await self.respond(request)
+
+    async def respond(self, request):
+        ops = request["batch"] if "batch" in request else [request]
+        if not isinstance(ops, list):
+            return {"ok": False, "error": "batch must be a list"}
+        if len(ops) == 1 and isinstance(ops[0], dict) and ops[0].get("op") == "list":
+            return await asyncio.wrap_future(self.submit(self.list_tasks, ops[0]))
+        if any(isinstance(op, dict) and op.get("op") == "list" for op in ops):
+            return {"ok": False, "error": "list cannot be batched with changes"}
+        if not ops:
+            return {"ok": True, "results": []}
+        return await asyncio.wrap_future(self.submit(self.apply, ops))
+
+    def submit(self, handler, arg):
+        """Runs handler(arg) on the engine's owning thread; returns a Future of the response."""
+        future = Future()
+
+        def run():
+            try:
+                response = handler(arg)
+            except (ValueError, TypeError) as e:
+                response = {"ok": False, "error": str(e)}
+            except Exception as e:
+                response = {"ok": False, "error": f"internal error: {e}"}
+            future.set_result(response)
+
+        self.engine.dispatch(run)
+        return future
+
+    def apply(self, ops):
+        results = self.engine.apply_batch(ops)
+        if self.on_applied:
+            self.on_applied()
+        return {"ok": True, "results": results}
+
+    def list_tasks(self, op):
+        try:
+            limit = int(op.get("limit", LIST_LIMIT))
+        except (TypeError, ValueError):
+            return {"ok": False, "error": "limit must be a number"}
+        # Alarm fields are only read under the engine lock
+        with self.engine.lock:
+            found = self.engine.search(str(op.get("query", "")), op.get("priority"), op.get("status", "all"))
+            tasks = [found[i].to_dict() for i in range(min(limit, len(found)))]
+        return {"ok": True, "total": len(found), "results": tasks}
@@ -0,0 +1,145 @@
+"""Load test for the local batch API (api.py).
+
+Runs a headless engine with a dispatcher thread standing in for the Tk
+loop (so batches take the same root.after-style hop as in the app), starts
+the server on a free port and drives it with concurrent asyncio clients.
+Reports requests/s and tasks/s for single-op and batched requests, and
+checks that every batch cost exactly one store write and one refresh.
+Run: python api_load_test.py [--clients 8] [--requests 500] [--batch 100]
+"""
+import argparse
+import asyncio
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from api import BatchServer
+from engine import FocusBellEngine
+
+
+class FakeTkLoop:
+    """Runs dispatched callables one at a time on a single thread, like root.after(0, fn)."""
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            fn = self.queue.get()
+            if fn is None:
+                return
+            fn()
+
+    def stop(self):
+        self.queue.put(None)
+        self.thread.join()
+
+
+async def client(port, requests, make_request):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port, limit=1 << 24)
+    for i in range(requests):
+        writer.write(json.dumps(make_request(i)).encode() + b"\n")
+        await writer.drain()
+        response = json.loads(await reader.readline())
+        assert response["ok"], response
+    writer.close()
+    await writer.wait_closed()
+
+
+def run_phase(port, clients, requests, make_request):
+    async def main():
+        await asyncio.gather(*(client(port, requests, make_request) for _ in range(clients)))
+    start = time.perf_counter()
+    asyncio.run(main())
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=500, help="per client")
+    parser.add_argument("--batch", type=int, default=100, help="ops per batched request")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    with open(os.path.join(tmp, "settings.json"), "w") as f:
+        # Synchronous writes so they can be counted per batch
+        json.dump({"storage": "journal", "watch_file": False, "background_writes": False}, f)
+    engine = FocusBellEngine(os.path.join(tmp, "tasks.json"), os.path.join(tmp, "settings.json"))
+    engine.load()
+
+    writes = [0]
+    commit = engine.store.commit
+    def counting_commit(get_alarms, changes):
+        writes[0] += 1
+        commit(get_alarms, changes)
+    engine.store.commit = counting_commit
+
+    tk_loop = FakeTkLoop()
+    engine.dispatch = tk_loop.queue.put
+    refreshes = [0]
+    def on_applied():
+        refreshes[0] += 1
+
+    token = "load-test"
+    server = BatchServer(engine, port=0, on_applied=on_applied, token=token)
+    assert server.start()
+    engine.start()
+
+    due = (datetime.now() + timedelta(days=1)).isoformat(timespec="seconds")
+    create = lambda i: {"op": "create", "task_name": f"ci job {i}", "alarm_time": due, "priority": "Low"}
+    single = lambda i: dict(create(i), token=token)
+    batch = lambda i: {"token": token, "batch": [create(i * args.batch + k) for k in range(args.batch)]}
+
+    total = args.clients * args.requests
+    elapsed = run_phase(server.port, args.clients, args.requests, single)
+    assert writes[0] == total and refreshes[0] == total, (writes, refreshes)
+    print(f"single ops: {total} requests in {elapsed:.2f}s = {total / elapsed:,.0f} req/s")
+
+    writes[0] = refreshes[0] = 0
+    batches = max(1, args.requests // 10)
+    elapsed = run_phase(server.port, args.clients, batches, batch)
+    count = args.clients * batches
+    assert writes[0] == count and refreshes[0] == count, (writes, refreshes)
+    print(f"batches of {args.batch}: {count} requests in {elapsed:.2f}s = {count / elapsed:,.0f} req/s, "
+          f"{count * args.batch / elapsed:,.0f} tasks/s (1 write + 1 refresh per batch)")
+
+    # A bad op rejects the whole batch
+    before = len(engine.alarms)
+    response = asyncio.run(server.handle_request(json.dumps(
+        {"token": token, "batch": [create(0), {"op": "complete", "id": "missing"}]})))
+    assert not response["ok"] and len(engine.alarms) == before, response
+    # ...as does a repeat rule naming a day that doesn't exist
+    response = asyncio.run(server.handle_request(json.dumps(
+        dict(single(0), recurrence={"kind": "days", "days": [9]}))))
+    assert not response["ok"] and "Days" in response["error"] and len(engine.alarms) == before, response
+
+    # A browser's text/plain POST is dropped at its request line, and a wrong token is refused
+    async def probe(payload):
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write(payload)
+        await writer.drain()
+        lines = []
+        while line := await reader.readline():
+            lines.append(json.loads(line))
+        writer.close()
+        return lines
+    body = json.dumps(dict(single(0), token="guess")) + "\n" + json.dumps(single(1))
+    post = f"POST / HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: text/plain\r\n\r\n{body}\n"
+    for payload in (post.encode(), body.encode() + b"\n"):
+        responses = asyncio.run(probe(payload))
+        assert len(responses) == 1 and not responses[0]["ok"], responses
+    assert len(engine.alarms) == before, "rejected connection still created tasks"
+    listed = asyncio.run(server.handle_request(json.dumps({"op": "list", "token": token, "limit": 5})))
+    assert listed["ok"] and listed["total"] == before and len(listed["results"]) == 5, listed
+
+    server.stop()
+    engine.stop()
+    tk_loop.stop()
+    print(f"{len(engine.alarms)} tasks created: OK")
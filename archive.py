@@ -0,0 +1,71 @@
+"""Append-only monthly partitions for completed tasks.
+
+<tasks>_archive/<YYYY-MM>.jsonl holds one compact JSON line per archived
+alarm (Alarm.to_dict format plus "archived_at"), partitioned by the month
+the alarm was due. Files are only ever appended to, and a month is read
+only when the history view asks for it, so startup never pays for history.
+Records are full copies keyed by id, so re-archiving an alarm after a crash
+just replaces the earlier line when the month is read.
+"""
+import json
+import os
+
+
+def month_of(alarm):
+    return alarm.alarm_time.strftime("%Y-%m")
+
+
+class TaskArchive:
+    def __init__(self, directory):
+        self.directory = directory
+        self._months = {}   # month -> records, dropped when that month is appended to
+
+    def path(self, month):
+        return os.path.join(self.directory, month + ".jsonl")
+
+    def append(self, alarms, archived_at):
+        """Appends alarms to their months' partitions and syncs them to disk."""
+        by_month = {}
+        for alarm in alarms:
+            by_month.setdefault(month_of(alarm), []).append(alarm)
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = archived_at.isoformat(timespec="seconds")
+        for month, group in by_month.items():
+            with open(self.path(month), 'a') as f:
+                for alarm in group:
+                    record = alarm.to_dict()
+                    record["archived_at"] = stamp
+                    f.write(json.dumps(record, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._months.pop(month, None)
+
+    def months(self):
+        """Archived months ("YYYY-MM"), newest first."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted((name[:-6] for name in names if name.endswith(".jsonl")), reverse=True)
+
+    def load_month(self, month):
+        """Records archived for month, in due order (cached until it changes)."""
+        records = self._months.get(month)
+        if records is not None:
+            return records
+        by_id = {}
+        try:
+            with open(self.path(month), 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn final line from a crash mid-append
+                        print(f"Skipping bad archive record in {month}")
+                        continue
+                    by_id[record.get("id")] = record
+        except FileNotFoundError:
+            pass
+        records = sorted(by_id.values(), key=lambda r: r.get("alarm_time", ""))
+        self._months[month] = records
+        return records
@@ -0,0 +1,209 @@
+"""Alarm sound playback behind a small backend interface.
+
+Every backend exposes:
+  load(path)   read the sound into memory once (call at startup)
+  play()       start looping the loaded sound, returns immediately
+  stop()       silence it
+  close()      release the device / helper process
+The sound is never re-read from disk on a trigger. play() records the time
+from the call to the sound being handed to the device as "time_to_sound".
+"""
+import shutil
+import sys
+import threading
+import time
+import wave
+
+from metrics import METRICS
+
+# Setting values for "audio_backend"; "file:<path>" selects the file sink
+AUDIO_BACKENDS = ("auto", "winsound", "aplay", "paplay", "null")
+
+
+def read_wav(path):
+    """Returns the file bytes after checking they are a readable PCM WAV."""
+    with open(path, "rb") as f:
+        data = f.read()
+    with wave.open(path, "rb") as w:
+        w.getparams()
+    return data
+
+
+class AudioBackend:
+    name = "null"
+
+    def __init__(self):
+        self.data = None
+        self.playing = False
+
+    def load(self, path):
+        try:
+            self.data = read_wav(path)
+        except Exception as e:
+            print(f"Error loading sound: {e}")
+            self.data = None
+
+    def play(self):
+        self.playing = True
+
+    def stop(self):
+        self.playing = False
+
+    def close(self):
+        self.stop()
+
+
+class NullBackend(AudioBackend):
+    """Plays nothing; counts plays so tests can assert on them."""
+
+    def __init__(self):
+        super().__init__()
+        self.plays = 0
+
+    def play(self):
+        start = time.perf_counter()
+        self.plays += 1
+        self.playing = True
+        METRICS.observe("time_to_sound", (time.perf_counter() - start) * 1000)
+
+
+class FileSinkBackend(NullBackend):
+    """Writes the sound to a file instead of a device, once per play()."""
+    name = "file"
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+
+    def play(self):
+        start = time.perf_counter()
+        self.plays += 1
+        self.playing = True
+        if self.data is not None:
+            with open(self.path, "ab") as f:
+                f.write(self.data)
+        METRICS.observe("time_to_sound", (time.perf_counter() - start) * 1000)
+
+
+class LoopingBackend(AudioBackend):
+    """Loops the sound on a worker thread until stop()."""
+
+    def __init__(self):
+        super().__init__()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def play(self):
+        if self.data is None or self.playing:
+            return
+        self.playing = True
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, args=(self._stop, time.perf_counter()), daemon=True)
+        self._thread.start()
+
+    def _loop(self, stop, requested):
+        first = True
+        while not stop.is_set():
+            if not self._play_once(stop, requested if first else None):
+                break
+            first = False
+
+    def _play_once(self, stop, requested):
+        """Plays the sound once; returns False to end the loop."""
+        raise NotImplementedError
+
+    def stop(self):
+        if not self.playing:
+            return
+        self.playing = False
+        self._stop.set()
+        self._interrupt()
+
+    def _interrupt(self):
+        pass
+
+
+class WinsoundBackend(LoopingBackend):
+    # SND_ASYNC cannot be combined with SND_MEMORY, so the loop runs on our thread
+    name = "winsound"
+
+    def __init__(self):
+        super().__init__()
+        import winsound
+        self.winsound = winsound
+
+    def _play_once(self, stop, requested):
+        flags = self.winsound.SND_MEMORY | self.winsound.SND_NODEFAULT
+        if requested is not None:
+            METRICS.observe("time_to_sound", (time.perf_counter() - requested) * 1000)
+        try:
+            self.winsound.PlaySound(self.data, flags)
+        except Exception as e:
+            print(f"Error playing sound: {e}")
+            return False
+        return True
+
+    def _interrupt(self):
+        try:
+            self.winsound.PlaySound(None, self.winsound.SND_PURGE)
+        except Exception:
+            pass
+
+
+class PipeBackend(LoopingBackend):
+    """Streams the in-memory WAV to a player's stdin (aplay for ALSA, paplay for PulseAudio/PipeWire)."""
+    COMMANDS = {
+        "aplay": ["aplay", "-q", "-"],
+        "paplay": ["paplay"],
+    }
+
+    def __init__(self, player):
+        super().__init__()
+        self.name = player
+        self.command = self.COMMANDS[player]
+        self._proc = None
+        self._proc_lock = threading.Lock()
+
+    def _play_once(self, stop, requested):
+        import subprocess
+        with self._proc_lock:
+            if stop.is_set():
+                return False
+            try:
+                self._proc = subprocess.Popen(self.command, stdin=subprocess.PIPE,
+                                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            except OSError as e:
+                print(f"Error playing sound: {e}")
+                return False
+            proc = self._proc
+        if requested is not None:
+            METRICS.observe("time_to_sound", (time.perf_counter() - requested) * 1000)
+        try:
+            proc.stdin.write(self.data)
+            proc.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        return proc.wait() == 0
+
+    def _interrupt(self):
+        with self._proc_lock:
+            if self._proc is not None and self._proc.poll() is None:
+                self._proc.kill()
+            self._proc = None
+
+
+def make_backend(kind="auto"):
+    """Picks a backend by name; "auto" uses winsound on Windows, else aplay/paplay, else silence."""
+    if kind == "null":
+        return NullBackend()
+    if kind.startswith("file:"):
+        return FileSinkBackend(kind[5:])
+    if kind in ("auto", "winsound") and sys.platform == "win32":
+        return WinsoundBackend()
+    players = [kind] if kind in PipeBackend.COMMANDS else ["paplay", "aplay"] if kind == "auto" else []
+    for player in players:
+        if shutil.which(player):
+            return PipeBackend(player)
+    if kind != "auto":
+        print(f"Audio backend '{kind}' is not available, sound disabled")
+    return NullBackend()
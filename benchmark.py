@@ -0,0 +1,320 @@
+"""Times load, save, dashboard render, navigation and trigger latency on synthetic task files.
+
+Each size gets its own tasks.json in a temp directory. Results are written as
+JSON (one entry per size, milliseconds, min/median/max over the repeats) so two
+runs can be compared with --compare.
+
+Rendering needs a display; on Linux run it under Xvfb:
+    xvfb-run python benchmark.py
+Without one (or without main.py's dependencies) the render columns are null.
+navigate_ms is one dashboard -> editor -> dashboard -> settings -> dashboard
+round trip; the first repeat includes building the cached views.
+
+--startup adds cold-start numbers: `import main` time from -X importtime
+(headless) and launch-to-first-frame from the app's timing hook (needs a
+display), compared against main.FIRST_PAINT_TARGET_MS.
+
+Run: python benchmark.py [--sizes 10,1000,100000] [--output benchmark.json] [--startup]
+"""
+import argparse
+import ast
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from engine import Alarm, FocusBellEngine
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000]
+RENDER_ITEMS = 50
+
+# Every run is silent and self-contained: no sound, no file watcher
+QUIET_SETTINGS = {"audio_backend": "null", "watch_file": False}
+
+
+def stats(samples):
+    if not samples:
+        return None
+    return {
+        "min": round(min(samples), 3),
+        "median": round(statistics.median(samples), 3),
+        "max": round(max(samples), 3),
+    }
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def make_tasks_file(path, size, seed=0):
+    """Writes size synthetic alarms: mixed priorities, ~20% completed, some recurring.
+
+    Only completed alarms are in the past, so opening the app on the file
+    doesn't start with a trigger window full of overdue alarms.
+    """
+    rng = random.Random(seed)
+    now = datetime.now().replace(second=0, microsecond=0)
+    data = []
+    for i in range(size):
+        active = rng.random() > 0.2
+        alarm = Alarm(
+            f"Task {i}",
+            now + timedelta(minutes=rng.randint(1 if active else -600, 60 * 24 * 30)),
+            active=active,
+            priority=rng.choice(["High", "Medium", "Low"]),
+        )
+        if i % 20 == 0:
+            alarm.recurrence = {"kind": "daily", "at": alarm.alarm_time.strftime("%H:%M")}
+        data.append(alarm.to_dict())
+    with open(path, "w") as f:
+        json.dump(data, f, indent=4)
+
+
+def write_settings(workdir, **settings):
+    settings_file = os.path.join(workdir, "settings.json")
+    with open(settings_file, "w") as f:
+        json.dump(dict(QUIET_SETTINGS, **settings), f)
+    return settings_file
+
+
+def new_engine(workdir, storage, background_writes=False):
+    settings_file = write_settings(workdir, storage=storage, background_writes=background_writes)
+    engine = FocusBellEngine(os.path.join(workdir, "tasks.json"), settings_file)
+    engine.load_settings()
+    return engine
+
+# ========== BENCHMARKS ==========
+def bench_load_save(workdir, storage, repeat):
+    load, save = [], []
+    for _ in range(repeat):
+        engine = new_engine(workdir, storage)
+        load.append(timed(engine.load_tasks))
+        save.append(timed(engine.save_tasks))
+        engine.store.close()
+    return stats(load), stats(save)
+
+
+def bench_trigger(workdir, storage, samples):
+    """Due-to-fire latency: how long after its due second the checker hands an alarm over.
+
+    Uses background writes like the app does, so saves don't stall the checker.
+    """
+    engine = new_engine(workdir, storage, background_writes=True)
+    engine.load()
+    latencies = []
+    done = threading.Event()
+
+    def on_trigger(alarms):
+        fired_at = time.time()
+        for alarm in engine.mark_fired(alarms):
+            if alarm.task_name.startswith("probe"):
+                latencies.append((fired_at - alarm.due) * 1000)
+        if len(latencies) >= samples:
+            done.set()
+
+    engine.on_trigger = on_trigger
+    engine.start()
+    base = datetime.fromtimestamp(int(time.time()) + 1)
+    for i in range(samples):
+        engine.add_alarm(f"probe {i}", base + timedelta(seconds=i), priority="High")
+    done.wait(samples + 5)
+    engine.stop()
+    return stats(latencies)
+
+
+def load_ui():
+    """Returns (tk, main) or None when no display / UI dependencies are available."""
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+        root.withdraw()
+        root.destroy()
+        import main
+    except Exception as e:
+        print(f"Render benchmarks skipped: {e}")
+        return None
+    return tk, main
+
+
+def bench_render(ui, workdir, repeat):
+    tk, main = ui
+    cwd = os.getcwd()
+    os.chdir(workdir)  # FocusBellApp uses the default file names
+    root = tk.Tk()
+    try:
+        app = main.FocusBellApp(root)
+        app.engine.finish_loading_now()
+        root.update()
+
+        dashboard, items = [], []
+        for _ in range(repeat):
+            app.dashboard.destroy()
+            app.dashboard = None
+
+            def show():
+                app.show_dashboard()
+                root.update_idletasks()
+            dashboard.append(timed(show))
+
+            alarms = app.alarms[:RENDER_ITEMS]
+            if alarms:
+                start = time.perf_counter()
+                cards = [app.render_alarm_item(a) for a in alarms]
+                root.update_idletasks()
+                items.append((time.perf_counter() - start) * 1000 / len(cards))
+                for card in cards:
+                    card.frame.destroy()
+                for alarm in alarms:
+                    app.cards.pop(alarm.id, None)
+
+        def navigate():
+            for show in (app.show_editor, app.show_dashboard, app.show_settings, app.show_dashboard):
+                show()
+                root.update_idletasks()
+        navigation = [timed(navigate) for _ in range(repeat)]
+        app.engine.stop()
+    finally:
+        root.destroy()
+        os.chdir(cwd)
+    return stats(dashboard), stats(items), stats(navigation)
+
+
+def run(sizes, storage, repeat, trigger_samples, render):
+    ui = load_ui() if render else None
+    results = []
+    for size in sizes:
+        workdir = tempfile.mkdtemp(prefix="focusbell-bench-")
+        try:
+            make_tasks_file(os.path.join(workdir, "tasks.json"), size)
+            entry = {"size": size}
+            entry["load_tasks_ms"], entry["save_tasks_ms"] = bench_load_save(workdir, storage, repeat)
+            entry["show_dashboard_ms"], entry["render_alarm_item_ms"], entry["navigate_ms"] = (
+                bench_render(ui, workdir, repeat) if ui else (None, None, None))
+            entry["trigger_latency_ms"] = bench_trigger(workdir, storage, trigger_samples)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        results.append(entry)
+        print(json.dumps(entry))
+    return results
+
+
+def import_time_ms(module):
+    """Cumulative import time of `module` in a fresh interpreter, from -X importtime."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True, cwd=HERE)
+    for line in proc.stderr.splitlines():
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000
+    return None
+
+
+def bench_startup(repeat):
+    imports = [import_time_ms("main") for _ in range(repeat)]
+    entry = {"import_main_ms": stats([t for t in imports if t is not None])}
+
+    # Launch to first frame, reported by FocusBellApp.record_first_paint
+    paints = []
+    workdir = tempfile.mkdtemp(prefix="focusbell-bench-")
+    try:
+        make_tasks_file(os.path.join(workdir, "tasks.json"), 1000)
+        write_settings(workdir)
+        env = dict(os.environ, FOCUSBELL_TIMING="1", FOCUSBELL_EXIT_AFTER_PAINT="1")
+        for _ in range(repeat):
+            proc = subprocess.run([sys.executable, os.path.join(HERE, "main.py")], capture_output=True,
+                                  text=True, cwd=workdir, env=env, timeout=60)
+            for line in proc.stdout.splitlines():
+                if line.startswith("Startup timings: "):
+                    timings = ast.literal_eval(line[len("Startup timings: "):].split(" (target")[0])
+                    paints.append(timings["first_paint_ms"])
+                    break
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    entry["first_paint_ms"] = stats(paints)
+    if not paints:
+        print("First-paint timing skipped: main.py did not paint (no display?)")
+
+    with open(os.path.join(HERE, "main.py")) as f:
+        target = next((int(line.split("=")[1]) for line in f if line.startswith("FIRST_PAINT_TARGET_MS")), None)
+    entry["first_paint_target_ms"] = target
+    print(json.dumps(entry))
+    return entry
+
+
+def metadata(storage, repeat):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=HERE).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "storage": storage,
+        "repeat": repeat,
+    }
+
+
+def compare(old, new):
+    """Prints new/old median ratios for every metric both runs measured."""
+    for key, value in new.get("startup", {}).items():
+        before = old.get("startup", {}).get(key)
+        if isinstance(value, dict) and isinstance(before, dict) and before["median"]:
+            ratio = value["median"] / before["median"]
+            flag = "  <-- slower" if ratio > 1.2 else ""
+            print(f"{'startup':>7} {key:<22} {before['median']:>10.3f} -> {value['median']:>10.3f}"
+                  f"  x{ratio:.2f}{flag}")
+    old_by_size = {e["size"]: e for e in old["results"]}
+    for entry in new["results"]:
+        before = old_by_size.get(entry["size"])
+        if not before:
+            continue
+        for key, value in entry.items():
+            if key == "size" or not value or not before.get(key):
+                continue
+            ratio = value["median"] / before[key]["median"] if before[key]["median"] else float("inf")
+            flag = "  <-- slower" if ratio > 1.2 else ""
+            print(f"{entry['size']:>7} {key:<22} {before[key]['median']:>10.3f} -> {value['median']:>10.3f}"
+                  f"  x{ratio:.2f}{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)))
+    parser.add_argument("--storage", default="json", choices=["json", "journal", "sqlite"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--trigger-samples", type=int, default=3)
+    parser.add_argument("--no-render", action="store_true")
+    parser.add_argument("--startup", action="store_true", help="also measure cold start")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--compare", metavar="OLD_JSON")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    report = {
+        "meta": metadata(args.storage, args.repeat),
+        "results": run(sizes, args.storage, args.repeat, args.trigger_samples, not args.no_render),
+    }
+    if args.startup:
+        report["startup"] = bench_startup(args.repeat)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
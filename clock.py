@@ -0,0 +1,91 @@
+"""Time sources for the scheduler.
+
+Alarms are stored as wall-clock times, but the checker sleeps on the
+monotonic clock, which NTP steps and manual clock changes don't move.
+Comparing the two on every wake-up shows when the wall clock jumped or the
+machine was suspended (the monotonic clock stands still while asleep).
+
+Every clock exposes:
+  time()           wall-clock epoch seconds
+  monotonic()      seconds from an arbitrary start, never goes backwards
+  now()            time() as a naive local datetime
+  timeout(delay)   how long a Condition.wait should block for delay seconds
+                   (None = until notified)
+  add_listener(fn) fn() is called whenever the clock is moved by hand
+FakeClock is moved only by advance()/jump()/suspend(), so tests and the
+simulator can replay hours of alarms instantly.
+"""
+import threading
+import time
+from datetime import datetime
+
+
+class SystemClock:
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def now(self):
+        return datetime.now()
+
+    def timeout(self, delay):
+        return min(delay, threading.TIMEOUT_MAX)
+
+    def add_listener(self, fn):
+        pass
+
+
+class FakeClock:
+    """A clock that only moves when told to; waiters are woken on every move."""
+
+    def __init__(self, start=None):
+        self._wall = time.time() if start is None else start
+        self._mono = 0.0
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def time(self):
+        return self._wall
+
+    def monotonic(self):
+        return self._mono
+
+    def now(self):
+        return datetime.fromtimestamp(self._wall)
+
+    def timeout(self, delay):
+        # Never sleep in real time; advance() wakes the waiter
+        return None
+
+    def add_listener(self, fn):
+        self._listeners.append(fn)
+
+    def advance(self, seconds):
+        """Time passes normally: both clocks move."""
+        with self._lock:
+            self._wall += seconds
+            self._mono += seconds
+        self._notify()
+
+    def jump(self, seconds):
+        """The wall clock is stepped (NTP, manual change); negative goes back."""
+        with self._lock:
+            self._wall += seconds
+        self._notify()
+
+    def suspend(self, seconds):
+        """The machine sleeps: wall time passes, the monotonic clock doesn't."""
+        self.jump(seconds)
+
+    def set(self, wall):
+        """Moves time forward to the wall-clock epoch `wall`."""
+        self.advance(max(0.0, wall - self._wall))
+
+    def _notify(self):
+        for fn in list(self._listeners):
+            fn()
+
+
+SYSTEM_CLOCK = SystemClock()
@@ -0,0 +1,148 @@
+"""Checks catch-up scheduling against a fake clock, headless and in real time seconds.
+
+Covers a normal trigger, resume from suspend and wall-clock jumps both ways
+under each catch-up policy, overdue alarms found at startup and a missed
+recurring alarm. Fails with an AssertionError on the first mismatch.
+Run: python clock_test.py
+"""
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from clock import FakeClock
+from engine import FocusBellEngine, MAX_SLEEP
+
+START = datetime(2026, 1, 5, 9, 0).timestamp()
+
+
+class Harness:
+    def __init__(self, policy="all", tasks=None):
+        self.tmp = tempfile.mkdtemp()
+        with open(os.path.join(self.tmp, "settings.json"), "w") as f:
+            json.dump({"catch_up": policy, "watch_file": False, "background_writes": False}, f)
+        if tasks is not None:
+            with open(os.path.join(self.tmp, "tasks.json"), "w") as f:
+                json.dump(tasks, f)
+        self.clock = FakeClock(START)
+        self.engine = FocusBellEngine(os.path.join(self.tmp, "tasks.json"),
+                                      os.path.join(self.tmp, "settings.json"), clock=self.clock)
+        self.triggers = []
+        self.skipped = []
+        self.engine.on_trigger = lambda due: self.triggers.append(self.engine.mark_fired(due))
+        self.engine.on_catch_up = self.skipped.append
+        self.engine.load()
+        self.engine.start()
+
+    def add(self, name, minutes, recurrence=None):
+        when = self.clock.now() + timedelta(minutes=minutes)
+        return self.engine.add_alarm(name, when, "Medium", recurrence)
+
+    def settle(self, until=None, timeout=2.0):
+        """Gives the checker thread time to react to the last clock move."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if until is not None and until():
+                return
+            time.sleep(0.01)
+        assert until is None, "timed out waiting for the checker"
+
+    def names(self):
+        return [[a.task_name for a in batch] for batch in self.triggers]
+
+    def stop(self):
+        self.engine.stop()
+
+
+def check_on_time():
+    h = Harness()
+    h.add("standup", 1)
+    h.clock.advance(59)
+    h.settle(timeout=0.2)
+    assert h.triggers == [], h.names()
+    h.clock.advance(1)
+    h.settle(lambda: h.triggers)
+    assert h.names() == [["standup"]] and h.engine.scheduler.jumps == 0, h.names()
+    h.stop()
+
+
+def suspended(policy):
+    h = Harness(policy)
+    for minutes in (10, 20, 30, 40):
+        h.add(f"task {minutes}", minutes)
+    h.add("later", 600)
+    h.clock.suspend(3600)
+    h.settle(lambda: h.triggers or h.skipped)
+    h.settle(timeout=0.2)
+    assert h.engine.scheduler.jumps == 1
+    return h
+
+
+def check_suspend():
+    h = suspended("all")
+    assert h.names() == [["task 10", "task 20", "task 30", "task 40"]] and not h.skipped, h.names()
+    h.stop()
+
+    h = suspended("newest")
+    assert h.names() == [["task 40"]], h.names()
+    assert sorted(a.task_name for a in h.skipped[0]) == ["task 10", "task 20", "task 30"]
+    assert all(not a.active for a in h.skipped[0])
+    h.stop()
+
+    h = suspended("summarize")
+    assert h.triggers == [] and len(h.skipped) == 1 and len(h.skipped[0]) == 4
+    # Nothing missed is left to ring later
+    h.clock.advance(MAX_SLEEP)
+    h.settle(timeout=0.2)
+    assert h.triggers == [] and h.engine.active_count() == 1
+    h.stop()
+
+
+def check_jumps():
+    h = Harness("summarize")
+    h.add("lunch", 60)
+    # Clock set back an hour: lunch is two hours away on the wall clock
+    h.clock.jump(-3600)
+    h.clock.advance(3600 + 30)
+    h.settle(timeout=0.2)
+    assert h.triggers == [] and h.engine.scheduler.jumps == 1, h.names()
+    h.clock.advance(3600)
+    h.settle(lambda: h.triggers)
+    assert h.names() == [["lunch"]] and not h.skipped
+
+    # A small step forward is a normal trigger, not a catch-up
+    h.add("tea", 5)
+    h.clock.jump(5 * 60 + 30)
+    h.settle(lambda: len(h.triggers) == 2)
+    assert h.names()[1] == ["tea"] and not h.skipped
+    h.stop()
+
+
+def check_startup():
+    overdue = [{"id": f"old{i}", "task_name": f"old {i}", "priority": "Low", "active": True,
+                "alarm_time": (datetime.fromtimestamp(START) - timedelta(hours=i + 1)).isoformat()}
+               for i in range(50)]
+    h = Harness("newest", tasks=overdue)
+    h.settle(lambda: h.triggers and h.skipped)
+    assert h.names() == [["old 0"]] and len(h.skipped) == 1 and len(h.skipped[0]) == 49, h.names()
+    h.stop()
+
+
+def check_recurring():
+    h = Harness("all")
+    h.add("stretch", 30, {"kind": "hours", "every": 1,
+                          "anchor": (h.clock.now() + timedelta(minutes=30)).isoformat()})
+    h.clock.suspend(10 * 3600)
+    h.settle(lambda: h.triggers)
+    h.settle(timeout=0.2)
+    assert h.names() == [["stretch"]], h.names()
+    alarm = h.triggers[0][0]
+    assert alarm.active and alarm.due > h.clock.time(), "next occurrence should be in the future"
+    h.stop()
+
+
+if __name__ == "__main__":
+    for check in (check_on_time, check_suspend, check_jumps, check_startup, check_recurring):
+        check()
+        print(f"{check.__name__}: OK")
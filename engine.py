@@ -0,0 +1,1181 @@
+"""Headless FocusBell engine: alarm model, persistence and scheduling.
+
+Nothing in here touches tkinter or winsound, so the engine can run as a
+background service, in benchmarks or in a test process without a display.
+The Tk app in main.py is a thin client that registers callbacks.
+"""
+from datetime import datetime, timedelta
+import threading
+import time
+import heapq
+import itertools
+import os
+import json
+import queue
+from enum import IntEnum
+
+from archive import TaskArchive
+from clock import SYSTEM_CLOCK
+from metrics import METRICS
+from search import SearchResults, TaskIndex
+from storage import BackgroundWriter, make_store
+
+DATA_FILE = "tasks.json"
+SETTINGS_FILE = "settings.json"
+
+DEFAULT_SETTINGS = {
+    "snooze_min": 5,
+    "sound_enabled": True,
+    "storage": "json",   # "json" rewrites tasks.json, "journal" appends change records, "sqlite" uses tasks.db
+    "background_writes": True,
+    "metrics_enabled": False,   # timing histograms, exported from Settings
+    "audio_backend": "auto",    # see audio.AUDIO_BACKENDS
+    "fast_start": True,         # defer ttk styling and rarely used modules past the first frame
+    "watch_file": True,         # merge edits made to tasks.json by other programs (json storage)
+    "api_enabled": False,       # local JSON-lines API for scripts (see api.py)
+    "api_port": 47800,
+    "api_socket": "",           # Unix socket path; used instead of the port when set
+    "api_token": "",            # required on the TCP port; generated on first start
+    "catch_up": "all",          # missed alarms after sleep/clock jumps/startup, see CATCH_UP_POLICIES
+    "archive_after_days": 7     # completed tasks due longer ago move to the history archive; null keeps them
+}
+
+# What to do with alarms found more than MISSED_GRACE seconds overdue:
+# ring them all in one window, ring only the newest, or ring none and show
+# a summary. Alarms that are not rung are handled as if they had fired.
+CATCH_UP_POLICIES = ("all", "newest", "summarize")
+MISSED_GRACE = 60
+
+# The checker never sleeps longer than this, so a suspend or clock jump is
+# noticed within MAX_SLEEP seconds even when nothing is due
+MAX_SLEEP = 10.0
+# Wall vs. monotonic disagreement (seconds) treated as a clock jump
+JUMP_TOLERANCE = 2.0
+
+# Search results up to this size are sorted outright; larger ones are
+# filtered lazily from the cached dashboard order
+SEARCH_SORT_LIMIT = 1000
+
+# Alarms parsed before the first dashboard paint when loading in the background
+FIRST_PAGE = 50
+
+# ========== DATA MODEL ==========
+class Priority(IntEnum):
+    HIGH = 0
+    MEDIUM = 1
+    LOW = 2
+
+PRIORITY_NAMES = {Priority.HIGH: "High", Priority.MEDIUM: "Medium", Priority.LOW: "Low"}
+PRIORITY_BY_NAME = {name: prio for prio, name in PRIORITY_NAMES.items()}
+
+# Added to the due time of completed alarms so one int sorts "active first, then by time"
+INACTIVE_OFFSET = 1 << 40
+
+
+class Alarm:
+    """One task. Hot fields are compact: due is integer epoch seconds and
+    prio a Priority; alarm_time/priority stay available as datetime/str.
+    recurrence is None for one-shot alarms, otherwise a rule dict (see
+    make_recurrence); only the next occurrence is ever stored."""
+    __slots__ = ("id", "task_name", "due", "active", "prio", "recurrence")
+
+    def __init__(self, task_name, alarm_time, active=True, id=None, priority="Medium", recurrence=None):
+        if not id:
+            import uuid  # deferred: loaded alarms already carry ids
+            id = str(uuid.uuid4())
+        self.id = id
+        self.task_name = task_name
+        self.alarm_time = alarm_time
+        self.active = active
+        self.priority = priority
+        self.recurrence = recurrence
+
+    @property
+    def alarm_time(self):
+        return datetime.fromtimestamp(self.due)
+
+    @alarm_time.setter
+    def alarm_time(self, value):
+        self.due = int(value.timestamp())
+
+    @property
+    def priority(self):
+        return PRIORITY_NAMES[self.prio]
+
+    @priority.setter
+    def priority(self, value):
+        self.prio = PRIORITY_BY_NAME.get(value, Priority.MEDIUM)
+
+    def copy(self):
+        clone = Alarm.__new__(Alarm)
+        clone.id, clone.task_name, clone.due = self.id, self.task_name, self.due
+        clone.active, clone.prio = self.active, self.prio
+        clone.recurrence = self.recurrence  # rule dicts are replaced, never mutated
+        return clone
+
+    def get_time_str(self):
+        return self.alarm_time.strftime("%I:%M %p")
+
+    def get_remaining_str(self, now=None):
+        if not self.active:
+            return "Done"
+        now_ts = now.timestamp() if now else time.time()
+        if self.due <= now_ts:
+            return "Due now"
+
+        # Human readable format
+        total_seconds = int(self.due - now_ts)
+        hours = total_seconds // 3600
+        minutes = (total_seconds % 3600) // 60
+
+        if hours > 0:
+            return f"in {hours}h {minutes}m"
+        else:
+            return f"in {minutes}m"
+
+    def get_repeat_str(self):
+        return describe_recurrence(self.recurrence)
+
+    def to_dict(self):
+        data = {
+            "id": self.id,
+            "task_name": self.task_name,
+            "alarm_time": self.alarm_time.isoformat(),
+            "active": self.active,
+            "priority": self.priority
+        }
+        if self.recurrence:
+            data["recurrence"] = self.recurrence
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        try:
+            return cls(
+                task_name=data["task_name"],
+                alarm_time=datetime.fromisoformat(data["alarm_time"]),
+                active=data["active"],
+                id=data.get("id"),
+                priority=data.get("priority", "Medium"),
+                recurrence=data.get("recurrence")
+            )
+        except Exception as e:
+            print(f"Error loading task: {e}")
+            return None
+
+
+def due_key(alarm):
+    return alarm.due
+
+
+def trigger_key(alarm):
+    # Order within a batch of due alarms: priority first, then time
+    return (alarm.prio, alarm.due)
+
+
+def dashboard_key(alarm):
+    # Active first, then by time, without building a tuple per item
+    return alarm.due if alarm.active else alarm.due + INACTIVE_OFFSET
+
+
+def alarm_time_from_clock(hour, minute, ampm, now=None):
+    """Next datetime matching a 12h clock time; rolls over to tomorrow if it has passed.
+
+    Raises ValueError for non-numeric input.
+    """
+    h = int(hour)
+    m = int(minute)
+
+    # Convert to 24h for storage
+    if ampm == "PM" and h != 12: h += 12
+    if ampm == "AM" and h == 12: h = 0
+
+    now = now or datetime.now()
+    alarm_dt = now.replace(hour=h, minute=m, second=0, microsecond=0)
+
+    # If time passed, assume tomorrow
+    if alarm_dt <= now:
+        alarm_dt += timedelta(days=1)
+    return alarm_dt
+
+# ========== RECURRENCE ==========
+WEEKDAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def make_recurrence(kind, alarm_time, every=None, days=None):
+    """Builds a rule dict for an alarm first due at alarm_time.
+
+    kind: "daily", "weekdays", "days" (days = list of 0=Mon..6=Sun) or
+    "hours" (every = N). Day-based rules remember the clock time; "hours"
+    remembers the last occurrence as its anchor.
+    """
+    if kind == "hours":
+        every = int(every)
+        if every < 1:
+            raise ValueError("Repeat interval must be at least 1 hour")
+        return {"kind": "hours", "every": every, "anchor": alarm_time.isoformat()}
+
+    rule = {"kind": kind, "at": alarm_time.strftime("%H:%M")}
+    if kind == "days":
+        days = sorted(set(int(d) for d in days or []))
+        if not days:
+            raise ValueError("Pick at least one day")
+        if not all(0 <= d <= 6 for d in days):
+            raise ValueError("Days must be 0 (Mon) to 6 (Sun)")
+        rule["days"] = days
+    elif kind not in ("daily", "weekdays"):
+        raise ValueError(f"Unknown repeat rule: {kind}")
+    return rule
+
+
+def next_occurrence(rule, now):
+    """First occurrence of rule strictly after now."""
+    if rule["kind"] == "hours":
+        anchor = datetime.fromisoformat(rule["anchor"])
+        if anchor > now:
+            return anchor
+        step = timedelta(hours=rule["every"])
+        return anchor + ((now - anchor) // step + 1) * step
+
+    if rule["kind"] == "weekdays":
+        allowed = {0, 1, 2, 3, 4}
+    elif rule["kind"] == "days":
+        allowed = set(rule["days"])
+    else:
+        allowed = None
+
+    h, m = (int(part) for part in rule["at"].split(":"))
+    candidate = now.replace(hour=h, minute=m, second=0, microsecond=0)
+    if candidate <= now:
+        candidate += timedelta(days=1)
+    while allowed is not None and candidate.weekday() not in allowed:
+        candidate += timedelta(days=1)
+    return candidate
+
+
+def advance_recurrence(rule, now):
+    """(next occurrence, updated rule) once the current occurrence has fired."""
+    due = next_occurrence(rule, now)
+    if rule["kind"] == "hours":
+        rule = dict(rule, anchor=due.isoformat())
+    return due, rule
+
+
+def describe_recurrence(rule):
+    if not rule:
+        return ""
+    if rule["kind"] == "daily":
+        return "Daily"
+    if rule["kind"] == "weekdays":
+        return "Weekdays"
+    if rule["kind"] == "hours":
+        return f"Every {rule['every']}h"
+    return ", ".join(WEEKDAY_NAMES[d] for d in rule["days"])
+
+# ========== SCHEDULER ==========
+class AlarmScheduler:
+    """Min-heap of active alarms keyed on their due time.
+
+    The checker thread sleeps until the earliest entry is due and is woken
+    early whenever the set changes. Superseded entries are left in the heap
+    and skipped when they surface (lazy deletion).
+
+    Sleeps run to a monotonic deadline derived from an (wall, monotonic)
+    anchor. When the wall clock no longer agrees with the anchor (NTP step,
+    manual change, resume from suspend) the anchor is moved and deadlines
+    follow the new wall time.
+
+    Each popped entry leaves a trigger id behind until claim() consumes it.
+    Rescheduling or removing the alarm voids it, so a trigger that is
+    delivered late, or twice, can never act on the alarm.
+    """
+
+    def __init__(self, clock=SYSTEM_CLOCK):
+        self._heap = []
+        self._entries = {}  # alarm.id -> live heap entry
+        self._fired = {}    # alarm.id -> trigger id awaiting claim()
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._running = True
+        self.clock = clock
+        self.jumps = 0
+        self._anchor = (clock.time(), clock.monotonic())
+        clock.add_listener(self.wake)
+
+    def reset(self, alarms):
+        with self._cond:
+            self._entries = {}
+            self._fired = {}
+            for alarm in alarms:
+                if alarm.active:
+                    self._entries[alarm.id] = [alarm.due, next(self._counter), alarm]
+            self._heap = list(self._entries.values())
+            heapq.heapify(self._heap)
+            self._cond.notify()
+
+    def schedule(self, alarm):
+        with self._cond:
+            self._entries.pop(alarm.id, None)
+            self._fired.pop(alarm.id, None)
+            if alarm.active:
+                entry = [alarm.due, next(self._counter), alarm]
+                self._entries[alarm.id] = entry
+                heapq.heappush(self._heap, entry)
+            self._cond.notify()
+
+    def unschedule(self, alarm):
+        with self._cond:
+            self._entries.pop(alarm.id, None)
+            self._fired.pop(alarm.id, None)
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    def wake(self):
+        with self._cond:
+            self._cond.notify()
+
+    def _check_jump(self, now, mono):
+        wall, anchor = self._anchor
+        skew = now - (wall + mono - anchor)
+        if abs(skew) > JUMP_TOLERANCE:
+            self._anchor = (now, mono)
+            self.jumps += 1
+            METRICS.observe("clock_jump", abs(skew) * 1000)
+
+    def _is_live(self, entry):
+        return self._entries.get(entry[2].id) is entry
+
+    def _pop_due(self, now):
+        # Collect every due alarm in one pass
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if self._is_live(entry):
+                del self._entries[entry[2].id]
+                self._fired[entry[2].id] = entry[1]
+                due.append(entry[2])
+        return due
+
+    def claim(self, alarm):
+        """True exactly once per trigger, and only if it hasn't been superseded."""
+        with self._cond:
+            return self._fired.pop(alarm.id, None) is not None
+
+    def wait_due(self):
+        """Blocks until alarms are due and returns all of them (None once stopped)."""
+        with self._cond:
+            while self._running:
+                due, delay = self._poll()
+                if due:
+                    return due
+                self._cond.wait(None if delay is None else self.clock.timeout(delay))
+            return None
+
+    def poll(self):
+        """One checker step without blocking.
+
+        Returns (due, delay): every alarm due now, or an empty list and the
+        seconds to sleep before polling again (None while nothing is
+        scheduled). A simulation drives this with a FakeClock, sleeping by
+        advancing the clock.
+        """
+        with self._cond:
+            return self._poll()
+
+    def _poll(self):
+        # Drop superseded entries from the top
+        while self._heap and not self._is_live(self._heap[0]):
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return [], None
+
+        now = self.clock.time()
+        mono = self.clock.monotonic()
+        self._check_jump(now, mono)
+        due = self._heap[0][0]
+        if due <= now:
+            return self._pop_due(now), 0
+        wall, anchor = self._anchor
+        delay = anchor + (due - wall) - mono
+        if delay <= 0:
+            # Wall clock slightly behind the anchor (within tolerance)
+            delay = due - now
+        return [], min(delay, MAX_SLEEP)
+
+# ========== ENGINE ==========
+class FocusBellEngine:
+    """Owns the alarm list, settings and checker thread.
+
+    Concurrency: self.lock guards self.alarms and every Alarm field. All
+    mutations take it for a short O(changes) section. The writer thread
+    only ever sees copies taken under the lock, and the checker thread only
+    talks to the scheduler, which has its own lock (always taken second).
+
+    Hooks (all optional, called with no UI assumptions):
+      on_trigger(alarms) - from the checker thread with every alarm that fell
+                           due together, ordered by priority then time
+      on_change()       - after any mutation has been persisted
+      on_external_change(summary) - after edits made to the tasks file by
+                           someone else were merged (see merge_external)
+      on_catch_up(alarms) - missed alarms that the catch-up policy handled
+                           without ringing (on the dispatch thread)
+      on_archived(count) - completed alarms left the list for the archive
+                           (on the dispatch thread, see archive_completed)
+
+    All time is read from self.clock, so tests can pass a clock.FakeClock.
+    """
+
+    def __init__(self, data_file=DATA_FILE, settings_file=SETTINGS_FILE, clock=SYSTEM_CLOCK):
+        self.data_file = data_file
+        self.settings_file = settings_file
+        self.clock = clock
+
+        # State
+        self.alarms = []
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.scheduler = AlarmScheduler(clock)
+        self.index = TaskIndex()
+        self.archive = TaskArchive(os.path.splitext(data_file)[0] + "_archive")
+        self._dashboard_order = None
+        self.lock = threading.RLock()
+        self.store = None
+        self.writer = None
+        self.check_thread = None
+        self.watcher = None
+        self._stale = None   # (items, signature) a save found unmerged, see _on_store_stale
+        self.is_running = False
+
+        # Streaming load state
+        self.loading = False
+        self.load_thread = None
+        self.load_timings = {}
+        self._loaded_rest = None
+        self._deleted_while_loading = set()
+
+        # Hooks
+        self.on_trigger = None
+        self.on_change = None
+        self.on_loaded = None
+        self.on_external_change = None
+        self.on_catch_up = None
+        self.on_archived = None
+        # Runs fn on the thread that owns self.alarms. Worker threads call it, so it
+        # must not wait for that thread (the UI queues fn for the Tk loop)
+        self.dispatch = lambda fn: fn()
+
+    # ========== DATA PERSISTENCE ==========
+    def load(self):
+        self.load_settings()
+        self.enable_metrics()
+        self.store = make_store(self.settings.get("storage", "json"), self.data_file)
+        self.load_tasks()
+        if self.settings.get("background_writes", True):
+            self.writer = BackgroundWriter(self.store, self._ordered_alarms, self._write_settings)
+        self.archive_old()
+
+    def load_streaming(self, first_page=FIRST_PAGE):
+        """Loads the first page of tasks now and the rest on a background thread.
+
+        Returns as soon as self.alarms holds the first page. When the rest
+        is parsed it is merged through self.dispatch and on_loaded() fires.
+        Persistence is held back until then so a partial list is never written.
+        """
+        start = time.perf_counter()
+        self.load_settings()
+        self.enable_metrics()
+        self.store = make_store(self.settings.get("storage", "json"), self.data_file)
+        if not hasattr(self.store, "iter_load") or not self.settings.get("background_writes", True):
+            self.load_tasks()
+            if self.settings.get("background_writes", True):
+                self.writer = BackgroundWriter(self.store, self._ordered_alarms, self._write_settings)
+            self.archive_old()
+            self.load_timings = {"first_page_ms": (time.perf_counter() - start) * 1000}
+            self.load_timings["full_load_ms"] = self.load_timings["first_page_ms"]
+            return
+
+        self.writer = BackgroundWriter(self.store, self._ordered_alarms, self._write_settings, paused=True)
+        items = self.store.iter_load()
+        first = []
+        try:
+            for item in items:
+                alarm = Alarm.from_dict(item)
+                if alarm:
+                    first.append(alarm)
+                    if len(first) >= first_page:
+                        break
+        except Exception as e:
+            print(f"Error loading tasks: {e}")
+            items = iter(())
+
+        self.alarms = sorted(first, key=due_key)
+        self.scheduler.reset(self.alarms)
+        self.index.rebuild(self.alarms)
+        self._dashboard_order = None
+        self.loading = True
+        self.load_timings = {"first_page_ms": (time.perf_counter() - start) * 1000}
+
+        def load_rest():
+            rest = []
+            try:
+                for item in items:
+                    alarm = Alarm.from_dict(item)
+                    if alarm:
+                        rest.append(alarm)
+            except Exception as e:
+                print(f"Error loading tasks: {e}")
+            self._loaded_rest = rest
+            self.load_timings["full_load_ms"] = (time.perf_counter() - start) * 1000
+            METRICS.observe("load_tasks", self.load_timings["full_load_ms"])
+            self.dispatch(self._finish_loading)
+
+        self.load_thread = threading.Thread(target=load_rest, daemon=True)
+        self.load_thread.start()
+
+    def _finish_loading(self):
+        with self.lock:
+            self._merge_loaded()
+
+    def _merge_loaded(self):
+        if not self.loading:
+            return
+        # In-memory alarms win over their on-disk copies; they may have been edited
+        by_id = {}
+        for alarm in self._loaded_rest:
+            by_id[alarm.id] = alarm
+        for alarm in self.alarms:
+            by_id[alarm.id] = alarm
+        for alarm_id in self._deleted_while_loading:
+            by_id.pop(alarm_id, None)
+
+        self.alarms = sorted(by_id.values(), key=due_key)
+        self.loading = False
+        self._loaded_rest = None
+        self._deleted_while_loading = set()
+        self.scheduler.reset(self.alarms)
+        self.index.rebuild(self.alarms)
+        self._dashboard_order = None
+        self.writer.resume()
+        self.archive_old()
+        if self.on_loaded:
+            self.on_loaded()
+
+    def finish_loading_now(self):
+        """Blocks until the background load is merged (on the owning thread)."""
+        # Also waits out a merge the load thread is running itself (direct dispatch)
+        thread = self.load_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        if self.loading:
+            self._finish_loading()
+
+    def flush(self):
+        if self.writer:
+            self.writer.flush()
+
+    def save_settings(self):
+        if self.writer:
+            self.writer.submit_settings()
+        else:
+            self._write_settings()
+
+    def _write_settings(self):
+        try:
+            with open(self.settings_file, 'w') as f:
+                json.dump(self.settings, f, indent=4)
+        except Exception as e:
+            print(f"Error saving settings: {e}")
+
+    def enable_metrics(self):
+        # The FOCUSBELL_METRICS environment variable turns them on regardless
+        if self.settings.get("metrics_enabled"):
+            METRICS.enabled = True
+
+    def export_metrics(self, path):
+        METRICS.export(path)
+
+    def load_settings(self):
+        if not os.path.exists(self.settings_file):
+            return
+        try:
+            with open(self.settings_file, 'r') as f:
+                data = json.load(f)
+                self.settings.update(data)
+        except Exception as e:
+            print(f"Error loading settings: {e}")
+
+    def save_tasks(self):
+        if self.writer:
+            self.writer.submit_full()
+            return
+        try:
+            with METRICS.timer("save_tasks"):
+                self.store.save(self._ordered_alarms())
+        except Exception as e:
+            print(f"Error saving tasks: {e}")
+
+    @METRICS.timed("load_tasks")
+    def load_tasks(self):
+        if self.store is None:
+            self.store = make_store(self.settings.get("storage", "json"), self.data_file)
+
+        try:
+            data = self.store.load()
+            self.alarms = []
+            for item in data:
+                alarm = Alarm.from_dict(item)
+                if alarm:
+                    # Active alarms that are already overdue stay active; the
+                    # checker's first pass hands them to the catch-up policy
+                    self.alarms.append(alarm)
+
+            self.alarms.sort(key=due_key)
+        except Exception as e:
+            print(f"Error loading tasks: {e}")
+        self.scheduler.reset(self.alarms)
+        self.index.rebuild(self.alarms)
+        self._dashboard_order = None
+
+    def snapshot(self):
+        """Copies of all alarms in dashboard order, safe to use off-thread."""
+        return self._ordered_alarms()
+
+    def _ordered_alarms(self):
+        # Dashboard order (active first, by time), so a streaming load of the
+        # saved file sees the next due and first page of active tasks first.
+        # Copies, so the writer thread never reads an alarm mid-update.
+        with self.lock:
+            alarms = [a.copy() for a in self.alarms]
+        alarms.sort(key=dashboard_key)
+        return alarms
+
+    def _changed(self, changes):
+        # changes: list of (op, alarm), op in create/update/delete/snooze/complete
+        self._dashboard_order = None
+        for op, alarm in changes:
+            if op == "delete":
+                self.index.remove(alarm.id)
+            else:
+                self.index.update(alarm)
+        if self.writer:
+            changes = [(op, alarm.copy()) for op, alarm in changes]
+            self.writer.submit(changes) # PERSIST (coalesced, off-thread)
+        else:
+            try:
+                with METRICS.timer("save_tasks"):
+                    self.store.commit(self._ordered_alarms, changes) # PERSIST
+            except Exception as e:
+                print(f"Error saving tasks: {e}")
+        if self.on_change:
+            self.on_change()
+
+    def _owns(self, alarm):
+        # O(1) "alarm in self.alarms" through the index, which maps every id to its Alarm
+        return self.index.alarms.get(alarm.id) is alarm
+
+    # ========== SEARCH ==========
+    def search(self, text="", priority=None, status="all"):
+        """Alarms whose name has a word starting with each word of text,
+        optionally limited to a priority name and status (see search.STATUS_FILTERS).
+
+        Returns a sequence in dashboard order: a list for small results, a
+        lazily filled SearchResults for large ones.
+        """
+        prio = PRIORITY_BY_NAME.get(priority) if priority else None
+        with self.lock:
+            ordered = self.dashboard_order()
+            if not text.strip() and prio is None and status == "all":
+                return list(ordered)
+            ids = self.index.search(text, prio, status)
+            # Few hits: sort just those. Many: walk the cached order on demand,
+            # within the active or the completed part (active sort first)
+            if len(ids) <= SEARCH_SORT_LIMIT:
+                return sorted((self.index.alarms[i] for i in ids), key=dashboard_key)
+            if status == "active":
+                return SearchResults(ordered, ids, stop=len(self.index.active))
+            if status == "completed":
+                return SearchResults(ordered, ids, start=len(self.index.active))
+            return SearchResults(ordered, ids)
+
+    def active_count(self):
+        return len(self.index.active)
+
+    def completed_count(self):
+        return len(self.index.completed)
+
+    def dashboard_order(self):
+        """All alarms in dashboard order; cached until the next change or load."""
+        with self.lock:
+            if self._dashboard_order is None:
+                self._dashboard_order = sorted(self.alarms, key=dashboard_key)
+            return self._dashboard_order
+
+    # ========== TRANSITIONS ==========
+    def add_alarm(self, task_name, alarm_time, priority="Medium", recurrence=None):
+        if recurrence:
+            alarm_time = next_occurrence(recurrence, self.clock.now())
+        alarm = Alarm(task_name, alarm_time, priority=priority, recurrence=recurrence)
+        with self.lock:
+            self.alarms.append(alarm)
+            self.scheduler.schedule(alarm)
+            self._changed([("create", alarm)])
+        return alarm
+
+    def import_alarms(self, alarms):
+        """Adds or replaces (by id) many alarms with a single commit.
+
+        Active one-shot alarms already in the past come in completed, and
+        recurring ones move on to their next occurrence, so an old calendar
+        export doesn't ring all at once. Returns (added, updated, past) counts.
+        """
+        now = self.clock.now()
+        now_ts = now.timestamp()
+        past = 0
+        for alarm in alarms:
+            if alarm.active and alarm.due <= now_ts:
+                if alarm.recurrence:
+                    alarm.alarm_time, alarm.recurrence = advance_recurrence(alarm.recurrence, now)
+                else:
+                    alarm.active = False
+                    past += 1
+        with self.lock:
+            by_id = {a.id: a for a in self.alarms}
+            changes = []
+            added = updated = 0
+            for alarm in alarms:
+                existing = by_id.get(alarm.id)
+                if existing is not None:
+                    existing.task_name, existing.due = alarm.task_name, alarm.due
+                    existing.active, existing.prio = alarm.active, alarm.prio
+                    existing.recurrence = alarm.recurrence
+                    changes.append(("update", existing))
+                    updated += 1
+                else:
+                    by_id[alarm.id] = alarm
+                    self.alarms.append(alarm)
+                    changes.append(("create", alarm))
+                    added += 1
+            # Rebuilding the heap once is O(n); pushing each import would be O(k log n)
+            self.scheduler.reset(self.alarms)
+            if changes:
+                self._changed(changes)
+        return added, updated, past
+
+    def update_alarm(self, alarm, task_name, alarm_time, priority, recurrence=None):
+        if recurrence:
+            alarm_time = next_occurrence(recurrence, self.clock.now())
+        with self.lock:
+            if not self._owns(alarm):
+                return # deleted in the meantime
+            alarm.task_name = task_name
+            alarm.alarm_time = alarm_time
+            alarm.active = True # Reactivate on edit
+            alarm.priority = priority
+            alarm.recurrence = recurrence
+            self.scheduler.schedule(alarm)
+            self._changed([("update", alarm)])
+
+    def delete_alarm(self, alarm):
+        with self.lock:
+            if not self._owns(alarm):
+                return False
+            self.alarms.remove(alarm)
+            if self.loading:
+                self._deleted_while_loading.add(alarm.id)
+            self.scheduler.unschedule(alarm)
+            self._changed([("delete", alarm)])
+        return True
+
+    def clear_completed(self):
+        """Moves every completed alarm to the history archive."""
+        self.finish_loading_now()
+        return self.archive_completed()
+
+    def mark_fired(self, alarms):
+        """Deactivates triggered alarms so they don't re-trigger while shown.
+
+        Returns the alarms actually accepted: a trigger is dropped if it was
+        already handled or the alarm was edited, snoozed or deleted since.
+        Snooze sets them active again with a new time. Recurring alarms
+        stay active and move straight on to their next occurrence.
+        """
+        now = self.clock.now()
+        with self.lock:
+            fired = [a for a in alarms if self.scheduler.claim(a)]
+            for alarm in fired:
+                if alarm.recurrence:
+                    alarm.alarm_time, alarm.recurrence = advance_recurrence(alarm.recurrence, now)
+                    self.scheduler.schedule(alarm)
+                else:
+                    alarm.active = False
+            if fired:
+                self._changed([("update" if a.recurrence else "complete", a) for a in fired])
+        return fired
+
+    def snooze_alarms(self, alarms, mins=None):
+        if mins is None:
+            mins = self.settings.get("snooze_min", 5)
+        alarm_time = self.clock.now() + timedelta(minutes=mins)
+        with self.lock:
+            alarms = [a for a in alarms if self._owns(a)]
+            for alarm in alarms:
+                alarm.alarm_time = alarm_time
+                alarm.active = True
+                self.scheduler.schedule(alarm)
+            self._changed([("snooze", a) for a in alarms])
+
+    def snooze_alarm(self, alarm, mins=None):
+        self.snooze_alarms([alarm], mins)
+
+    def complete_alarms(self, alarms):
+        with self.lock:
+            alarms = [a for a in alarms if a.active and self._owns(a)]
+            for alarm in alarms:
+                alarm.active = False
+                self.scheduler.unschedule(alarm)
+            if alarms:
+                self._changed([("complete", a) for a in alarms])
+
+    def complete_alarm(self, alarm):
+        self.complete_alarms([alarm])
+
+    # ========== ARCHIVE ==========
+    def archive_completed(self, due_before=None):
+        """Moves completed alarms (due before the epoch due_before, if given) to the archive.
+
+        The append and its fsync run on the writer thread; the alarms leave
+        the task list only once the archive is synced (on_archived fires
+        then), so a crash in between leaves a duplicate, never a lost task.
+        Returns the number queued for archiving.
+        """
+        with self.lock:
+            moved = [self.index.alarms[i] for i in self.index.completed]
+            if due_before is not None:
+                moved = [a for a in moved if a.due < due_before]
+            if not moved:
+                return 0
+            copies = [a.copy() for a in moved]
+            if self.writer is None:
+                if self._append_archive(copies):
+                    self._drop_archived(moved, copies)
+                return len(moved)
+        def job():
+            if self._append_archive(copies):
+                self.dispatch(lambda: self._drop_archived(moved, copies))
+        self.writer.submit_job(job)
+        return len(moved)
+
+    def _append_archive(self, copies):
+        try:
+            self.archive.append(copies, self.clock.now())
+        except OSError as e:
+            print(f"Error archiving tasks: {e}")
+            return False
+        return True
+
+    def _drop_archived(self, moved, copies):
+        with self.lock:
+            # Alarms edited, reopened or deleted since they were copied stay as they are
+            dropped = [a for a, c in zip(moved, copies)
+                       if self._owns(a) and not a.active and a.to_dict() == c.to_dict()]
+            if not dropped:
+                return
+            ids = {a.id for a in dropped}
+            self.alarms = [a for a in self.alarms if a.id not in ids]
+            self._changed([("delete", a) for a in dropped])
+        if self.on_archived:
+            self.on_archived(len(dropped))
+
+    def archive_old(self):
+        """Archives completed alarms due more than "archive_after_days" ago."""
+        days = self.settings.get("archive_after_days", 7)
+        if days is None:
+            return 0
+        return self.archive_completed(self.clock.time() - days * 86400)
+
+    def history_months(self):
+        return self.archive.months()
+
+    def load_history(self, month):
+        """Archived alarms due in month ("YYYY-MM"), oldest first.
+
+        Skips any that are back in the task list (reopened before their
+        archiving finished); they are archived again once completed.
+        """
+        records = self.archive.load_month(month)
+        with self.lock:
+            live = self.index.alarms
+            return [a for a in map(Alarm.from_dict, records) if a and a.id not in live]
+
+    # ========== BATCHES ==========
+    BATCH_OPS = ("create", "update", "snooze", "complete", "delete")
+
+    def apply_batch(self, ops):
+        """Applies a list of op dicts as one transaction (see api.py for the format).
+
+        Every op is checked before anything changes; a bad op raises
+        ValueError and the batch is dropped whole. All changes go out in a
+        single _changed() call, so one persistence write. Returns one
+        {"id": ...} result per op.
+        """
+        self.finish_loading_now()
+        now = self.clock.now()
+        with self.lock:
+            planned = []
+            deleted = set()
+            for op in ops:
+                kind, alarm, fields = self._plan_op(op, now)
+                if alarm is not None and alarm.id in deleted:
+                    raise ValueError(f"Task {alarm.id!r} is deleted earlier in the batch")
+                if kind == "delete":
+                    deleted.add(alarm.id)
+                planned.append((kind, alarm, fields))
+            changes = []
+            results = []
+            for kind, alarm, fields in planned:
+                if kind == "create":
+                    alarm = Alarm(fields["task_name"], fields["alarm_time"], priority=fields["priority"],
+                                  recurrence=fields["recurrence"])
+                    self.alarms.append(alarm)
+                    self.scheduler.schedule(alarm)
+                elif kind == "update":
+                    for name, value in fields.items():
+                        setattr(alarm, name, value)
+                    alarm.active = True # Reactivate on edit
+                    self.scheduler.schedule(alarm)
+                elif kind == "snooze":
+                    alarm.alarm_time = now + timedelta(minutes=fields["minutes"])
+                    alarm.active = True
+                    self.scheduler.schedule(alarm)
+                elif kind == "complete":
+                    alarm.active = False
+                    self.scheduler.unschedule(alarm)
+                elif kind == "delete":
+                    self.scheduler.unschedule(alarm)
+                    if self.loading:
+                        self._deleted_while_loading.add(alarm.id)
+                changes.append((kind, alarm))
+                results.append({"id": alarm.id})
+            if deleted:
+                self.alarms = [a for a in self.alarms if a.id not in deleted]
+            if changes:
+                self._changed(changes)
+        return results
+
+    def _plan_op(self, op, now):
+        """Validates one batch op; returns (kind, existing alarm or None, fields)."""
+        if not isinstance(op, dict) or op.get("op") not in self.BATCH_OPS:
+            raise ValueError(f"Unknown op: {op!r}")
+        kind = op["op"]
+        alarm = None
+        if kind != "create":
+            alarm = self.index.alarms.get(op.get("id"))
+            if alarm is None:
+                raise ValueError(f"No task with id {op.get('id')!r}")
+        if kind == "snooze":
+            minutes = int(op.get("minutes", self.settings.get("snooze_min", 5)))
+            if minutes < 1:
+                raise ValueError("Snooze must be at least 1 minute")
+            return kind, alarm, {"minutes": minutes}
+        if kind in ("complete", "delete"):
+            return kind, alarm, {}
+
+        fields = {}
+        if "task_name" in op or kind == "create":
+            name = op.get("task_name")
+            if not isinstance(name, str) or not name.strip():
+                raise ValueError("task_name must be a non-empty string")
+            fields["task_name"] = name.strip()
+        if "priority" in op or kind == "create":
+            priority = op.get("priority", "Medium")
+            if priority not in PRIORITY_BY_NAME:
+                raise ValueError(f"Unknown priority: {priority!r}")
+            fields["priority"] = priority
+        if "alarm_time" in op:
+            alarm_time = datetime.fromisoformat(op["alarm_time"])
+            if alarm_time.tzinfo is not None:
+                alarm_time = alarm_time.astimezone().replace(tzinfo=None)
+            fields["alarm_time"] = alarm_time
+        elif kind == "create" and not op.get("recurrence"):
+            raise ValueError("alarm_time is required")
+        if "recurrence" in op or kind == "create":
+            repeat = op.get("recurrence")
+            rule = None
+            if repeat:
+                if not isinstance(repeat, dict):
+                    raise ValueError("recurrence must be an object")
+                start = fields.get("alarm_time") or (alarm.alarm_time if alarm else now)
+                rule = make_recurrence(repeat.get("kind"), start, repeat.get("every"), repeat.get("days"))
+                fields["alarm_time"] = next_occurrence(rule, now)
+            fields["recurrence"] = rule
+        return kind, alarm, fields
+
+    # ========== EXTERNAL CHANGES ==========
+    def start_watching(self):
+        if not self.settings.get("watch_file", True) or not hasattr(self.store, "read_external"):
+            return
+        from watcher import FileWatcher
+        self.store.on_stale = self._on_store_stale
+        self.watcher = FileWatcher(self.data_file, self._on_file_changed)
+        self.watcher.start()
+
+    def _on_file_changed(self, signature):
+        # Watcher thread: skip our own writes and parse before handing over
+        if signature == self.store.signature:
+            return
+        try:
+            items, signature = self.store.read_external()
+        except (OSError, ValueError) as e:
+            print(f"Error reading changed tasks: {e}")
+            return
+        self.dispatch(lambda: self.merge_external(items, signature))
+
+    def _on_store_stale(self, items, signature):
+        # Writer thread: an edit landed before the watcher reported it; merge, then save
+        self._stale = (items, signature)
+        self.dispatch(self._merge_stale)
+
+    def _merge_stale(self):
+        stale, self._stale = self._stale, None
+        if stale is not None:
+            self.merge_external(*stale, resave=True)
+
+    def merge_external(self, items, signature=None, resave=False):
+        """Merges the tasks file as another program left it, by Alarm.id.
+
+        Three-way: each alarm is compared with the file's contents after our
+        last load or save. A side that did not change it takes the other's
+        version. When both changed it, the running app's version wins,
+        except that an edit beats a delete. Only the touched alarms are
+        rescheduled and re-indexed. resave writes the merged list back even
+        without conflicts (a save of ours was held back). Returns a summary
+        dict of counts.
+        """
+        self.finish_loading_now()
+        disk = {item["id"]: item for item in items if isinstance(item, dict) and "id" in item}
+        summary = {"added": 0, "updated": 0, "removed": 0, "conflicts": 0}
+        with self.lock:
+            base = self.store.synced
+            by_id = {a.id: a for a in self.alarms}
+            removed = set()
+            for alarm_id in disk.keys() | base.keys():
+                theirs, ancestor = disk.get(alarm_id), base.get(alarm_id)
+                if theirs == ancestor:
+                    continue # not changed outside
+                alarm = by_id.get(alarm_id)
+                ours = alarm.to_dict() if alarm is not None else None
+                if ours == theirs:
+                    continue
+                if ours != ancestor:
+                    summary["conflicts"] += 1
+                    if not (ours is None and theirs is not None):
+                        continue # ours wins and is written back below
+                new = Alarm.from_dict(theirs) if theirs is not None else None
+                if theirs is None:
+                    removed.add(alarm_id)
+                    self.scheduler.unschedule(alarm)
+                    self.index.remove(alarm_id)
+                    summary["removed"] += 1
+                elif new is None:
+                    continue # unreadable entry, keep ours
+                elif alarm is None:
+                    alarm = new
+                    self.alarms.append(alarm)
+                    self.scheduler.schedule(alarm)
+                    self.index.update(alarm)
+                    summary["added"] += 1
+                else:
+                    alarm.task_name, alarm.due, alarm.active = new.task_name, new.due, new.active
+                    alarm.prio, alarm.recurrence = new.prio, new.recurrence
+                    self.scheduler.schedule(alarm)
+                    self.index.update(alarm)
+                    summary["updated"] += 1
+            if removed:
+                self.alarms = [a for a in self.alarms if a.id not in removed]
+            self.store.mark_synced(list(disk.values()), signature)
+            self._dashboard_order = None
+            if summary["conflicts"] or resave:
+                self.save_tasks() # converge the file on the merged list
+        if any(summary.values()) and self.on_external_change:
+            self.on_external_change(summary)
+        return summary
+
+    # ========== BACKGROUND CHECK ==========
+    def start(self):
+        self.is_running = True
+        self.check_thread = threading.Thread(target=self.alarm_check_loop, daemon=True)
+        self.check_thread.start()
+        self.start_watching()
+
+    def stop(self):
+        self.is_running = False
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+        self.scheduler.stop()
+        # stop() runs on the owning thread, which is about to wait on the writer: work
+        # the writer hands over from here on (archive drops, stale merges) is run below
+        handoff = queue.Queue()
+        self.dispatch = handoff.put
+        self.finish_loading_now()
+        # Flush-on-exit: drain the writer before closing the store
+        if self.writer is not None:
+            self.writer.flush()
+            while not handoff.empty():
+                handoff.get()()
+                self.writer.flush()
+            # A save held back for an external edit still needs its merge
+            self._merge_stale()
+            self.writer.close()
+            self.writer = None
+        if self.store is not None:
+            self.store.close()
+
+    def alarm_check_loop(self):
+        while self.is_running:
+            # Sleeps until alarms are due or until the set changes
+            due = self.scheduler.wait_due()
+            if due is None:
+                break
+            self.handle_due(due)
+
+    def handle_due(self, due):
+        """Hands alarms that fell due to on_trigger or to the catch-up policy."""
+        # The alarms have left the heap, so they cannot re-trigger until
+        # snooze/edit schedules them again
+        now = self.clock.time()
+        ring, skipped = self.split_missed(due, now)
+        if skipped:
+            self.dispatch(lambda: self.skip_missed(skipped))
+        if ring:
+            METRICS.observe_lateness("trigger_lateness", ring, now)
+            ring.sort(key=trigger_key)
+            if self.on_trigger:
+                self.on_trigger(ring)
+
+    def split_missed(self, due, now):
+        """(alarms to ring, alarms to handle silently) under the "catch_up" setting.
+
+        Only alarms more than MISSED_GRACE seconds overdue count as missed;
+        they all come out of the scheduler in one pass, so a long sleep
+        produces a single catch-up instead of a window per alarm.
+        """
+        policy = self.settings.get("catch_up", "all")
+        missed = [a for a in due if now - a.due > MISSED_GRACE]
+        if not missed or policy not in ("newest", "summarize"):
+            return due, []
+        ring = [a for a in due if now - a.due <= MISSED_GRACE]
+        if policy == "newest":
+            newest = max(missed, key=due_key)
+            ring.append(newest)
+            missed.remove(newest)
+        return ring, missed
+
+    def skip_missed(self, alarms):
+        """Handles missed alarms as fired without ringing them."""
+        skipped = self.mark_fired(alarms)
+        if skipped and self.on_catch_up:
+            self.on_catch_up(skipped)
@@ -1,18 +1,22 @@
-import tkinter as tk
-from tkinter import messagebox, ttk
-from datetime import datetime, timedelta
-import threading
 import time
+START_TIME = time.perf_counter()
+
+import tkinter as tk
+from tkinter import filedialog, messagebox, ttk
+import tkinter.font as tkfont
+from datetime import datetime
 import os
 import sys
-import winsound
-import uuid
-import webbrowser
-import json
+import bisect
+import queue
+import threading
+
+import audio
+from metrics import METRICS
+from engine import (FocusBellEngine, WEEKDAY_NAMES, alarm_time_from_clock, dashboard_key,
+                    make_recurrence, trigger_key)
 
 APP_NAME = "FocusBell"
-DATA_FILE = "tasks.json"
-SETTINGS_FILE = "settings.json"
 
 # ========== THEME CONFIG ==========
 THEME = {
@@ -34,6 +38,36 @@ THEME = {
     "prio_low": "#03DAC6",    # Low Priority (Teal)
 }
 
+# Editor "Repeat" choices -> recurrence kind
+REPEAT_CHOICES = {
+    "Never": None,
+    "Daily": "daily",
+    "Weekdays": "weekdays",
+    "Every N hours": "hours",
+    "Specific days": "days",
+}
+REPEAT_LABELS = {kind: label for label, kind in REPEAT_CHOICES.items() if kind}
+
+TRANSFER_FILETYPES = [("CSV", "*.csv"), ("iCalendar", "*.ics"), ("All files", "*.*")]
+
+# Dashboard status filter label -> search status
+STATUS_CHOICES = {"All": "all", "Active": "active", "Completed": "completed"}
+
+# Settings labels for engine.CATCH_UP_POLICIES
+CATCH_UP_CHOICES = {"Ring all": "all", "Ring newest only": "newest", "Summary only": "summarize"}
+
+# Launch-to-first-frame budget; FOCUSBELL_TIMING=1 reports against it
+FIRST_PAINT_TARGET_MS = 300
+
+# Above this many tasks the dashboard switches to the virtualized list
+VIRTUAL_LIST_THRESHOLD = 300
+
+# How often the Tk loop runs work posted from other threads (see post)
+POST_POLL_MS = 20
+
+# Rows the trigger window lists before summarizing the rest
+TRIGGER_ROW_LIMIT = 8
+
 # --------- RESOURCE PATH ----------
 def resource_path(relative):
     try:
@@ -42,58 +76,127 @@ def resource_path(relative):
         base = os.path.abspath(".")
     return os.path.join(base, relative)
 
-# ========== DATA MODEL ==========
-class Alarm:
-    def __init__(self, task_name, alarm_time, active=True, id=None, priority="Medium"):
-        self.id = id if id else str(uuid.uuid4())
-        self.task_name = task_name
-        self.alarm_time = alarm_time
-        self.active = active
-        self.priority = priority
-
-    def get_time_str(self):
-        return self.alarm_time.strftime("%I:%M %p")
-    
-    def get_remaining_str(self):
-        if not self.active:
-            return "Done"
+# ========== DASHBOARD CARDS ==========
+class AlarmCard:
+    """Widget references for one dashboard card, kept alive between refreshes."""
+    def __init__(self):
+        self.alarm = None
+        self.frame = None
+        self.state = None          # last rendered (active, priority, time, name, is_next, repeat)
+        self.remaining_text = None
+
+
+def longest_increasing_run(ids, old_pos):
+    """Ids (in new order) forming the longest subsequence whose old positions increase.
+
+    Those cards are already in the right relative order and don't need moving.
+    """
+    tails, tail_ids, parent = [], [], {}
+    for alarm_id in ids:
+        pos = old_pos.get(alarm_id)
+        if pos is None:
+            continue
+        i = bisect.bisect_left(tails, pos)
+        parent[alarm_id] = tail_ids[i - 1] if i > 0 else None
+        if i == len(tails):
+            tails.append(pos)
+            tail_ids.append(alarm_id)
+        else:
+            tails[i] = pos
+            tail_ids[i] = alarm_id
+
+    run = []
+    alarm_id = tail_ids[-1] if tail_ids else None
+    while alarm_id is not None:
+        run.append(alarm_id)
+        alarm_id = parent[alarm_id]
+    return run
+
+# ========== VIRTUAL LIST ==========
+class VirtualAlarmList:
+    """Scrollable list that only owns enough cards to fill the viewport.
+
+    Rows have a fixed height and are re-bound to whichever alarms are in
+    view while scrolling, so the widget count stays constant no matter how
+    many alarms there are.
+    """
+    ROW_HEIGHT = 96
+    ROW_GAP = 12
+
+    def __init__(self, app, parent):
+        self.app = app
+        self.items = []
+        self.next_task = None
+        self.offset = 0   # pixels scrolled from the top
+        self.rows = []
+
+        self.frame = tk.Frame(parent, bg=THEME["bg"])
+        self.viewport = tk.Frame(self.frame, bg=THEME["bg"], width=540)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self.yview)
+
+        self.viewport.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.viewport.bind("<Configure>", lambda e: self.layout())
+        self.viewport.bind("<Enter>", lambda e: self.viewport.bind_all("<MouseWheel>", self.on_mousewheel))
+        self.viewport.bind("<Leave>", lambda e: self.viewport.unbind_all("<MouseWheel>"))
+
+    def set_items(self, items, next_task):
+        self.items = items
+        self.next_task = next_task
+        self.layout()
+
+    def content_height(self):
+        return len(self.items) * self.ROW_HEIGHT
+
+    def clamp_offset(self):
+        max_offset = max(0, self.content_height() - self.viewport.winfo_height())
+        self.offset = max(0, min(self.offset, max_offset))
+
+    def ensure_pool(self):
+        # One row per visible slot plus one for the partially scrolled row
+        needed = self.viewport.winfo_height() // self.ROW_HEIGHT + 2
+        while len(self.rows) < needed:
+            self.rows.append(self.app.build_alarm_card(self.viewport))
+
+    def layout(self):
+        self.ensure_pool()
+        self.clamp_offset()
+
+        first = self.offset // self.ROW_HEIGHT
+        shift = self.offset % self.ROW_HEIGHT
         now = datetime.now()
-        if self.alarm_time <= now:
-            return "Due now"
-        delta = self.alarm_time - now
-        
-        # Human readable format
-        total_seconds = int(delta.total_seconds())
-        hours = total_seconds // 3600
-        minutes = (total_seconds % 3600) // 60
-        
-        if hours > 0:
-            return f"in {hours}h {minutes}m"
+        for k, card in enumerate(self.rows):
+            index = first + k
+            if index < len(self.items):
+                alarm = self.items[index]
+                self.app.update_alarm_item(card, alarm, alarm == self.next_task, now)
+                card.frame.place(x=0, y=k * self.ROW_HEIGHT - shift, relwidth=1.0,
+                                 height=self.ROW_HEIGHT - self.ROW_GAP)
+            else:
+                card.alarm = None
+                card.frame.place_forget()
+
+        total = self.content_height()
+        if total:
+            height = self.viewport.winfo_height()
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + height) / total))
         else:
-            return f"in {minutes}m"
-
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "task_name": self.task_name,
-            "alarm_time": self.alarm_time.isoformat(),
-            "active": self.active,
-            "priority": self.priority
-        }
-
-    @classmethod
-    def from_dict(cls, data):
-        try:
-            return cls(
-                task_name=data["task_name"],
-                alarm_time=datetime.fromisoformat(data["alarm_time"]),
-                active=data["active"],
-                id=data.get("id"),
-                priority=data.get("priority", "Medium")
-            )
-        except Exception as e:
-            print(f"Error loading task: {e}")
-            return None
+            self.scrollbar.set(0.0, 1.0)
+
+    def visible_cards(self):
+        return [card for card in self.rows if card.alarm is not None]
+
+    def yview(self, *args):
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * self.content_height())
+        elif args[0] == "scroll":
+            step = self.ROW_HEIGHT if args[2] == "units" else self.viewport.winfo_height()
+            self.offset += int(args[1]) * step
+        self.layout()
+
+    def on_mousewheel(self, event):
+        self.yview("scroll", -1 if event.delta > 0 else 1, "units")
 
 # ========== MAIN APP ==========
 class FocusBellApp:
@@ -103,38 +206,116 @@ class FocusBellApp:
         self.root.geometry("600x750")
         self.root.configure(bg=THEME["bg"])
         self.root.resizable(False, False)
-
-        # State
-        self.alarms = []
-        self.check_thread = None
+        self.fonts = {}   # (size, *styles) -> tkfont.Font, see font()
+        self.views = {}   # name -> Frame built once and re-packed (editor, settings)
+        self.editing_alarm = None
+
+        # Engine (alarms, settings, persistence, scheduling)
+        self.engine = FocusBellEngine()
+        self.inbox = queue.Queue()
+        self.engine.on_trigger = lambda due: self.post(lambda: self.trigger_alarm_ui(due))
+        self.alarm_window = None
+        self.ringing = []
+        self.engine.dispatch = self.post
+        self.engine.on_loaded = self.on_tasks_loaded
+        self.engine.on_external_change = lambda summary: self.refresh_dashboard()
+        self.engine.on_catch_up = self.show_catch_up
+        self.engine.on_archived = lambda count: self.refresh_dashboard()
         self.is_running = True
+        self.root.after(POST_POLL_MS, self.pump_inbox)
 
-        # Default Settings
-        self.settings = {
-            "snooze_min": 5,
-            "sound_enabled": True
-        }
+        # Load Data (first page now, the rest in the background; settings.json first)
+        self.engine.load_streaming()
 
-        # Custom Styles
-        self.setup_styles()
+        # Custom Styles (ttk theming is slow; in fast-start mode it waits for the first frame)
+        if not self.settings.get("fast_start", True):
+            self.setup_styles()
 
-        # Load Data
-        self.load_settings()
-        self.load_tasks()
+        # Alarm sound, decoded once so a trigger never touches the disk
+        self.audio = audio.make_backend(self.settings.get("audio_backend", "auto"))
+        self.audio.load(resource_path("alarm.wav"))
 
         # Build Initial UI (Dashboard)
+        self.dashboard = None
+        self.startup_timings = {}
         self.main_container = tk.Frame(self.root, bg=THEME["bg"])
         self.main_container.pack(fill="both", expand=True)
         
         self.show_dashboard()
+        self.root.after_idle(self.record_first_paint)
 
         # Start Background Thread
-        self.check_thread = threading.Thread(target=self.alarm_check_loop, daemon=True)
-        self.check_thread.start()
+        self.engine.start()
+
+        # Local API for scripts (optional); each batch ends in one dashboard refresh
+        self.api = None
+        self.refresh_pending = False
+        if self.settings.get("api_enabled"):
+            import api
+            socket_path = self.settings.get("api_socket") or None
+            if not socket_path and not self.settings.get("api_token"):
+                # Scripts read the token from settings.json
+                self.settings["api_token"] = api.new_token()
+                self.engine.save_settings()
+            self.api = api.BatchServer(self.engine, self.settings.get("api_port", api.DEFAULT_PORT), socket_path,
+                                       on_applied=self.schedule_refresh, token=self.settings.get("api_token") or None)
+            if not self.api.start():
+                self.api = None
 
         # Start UI Refresh Loop (for countdowns)
         self.refresh_ui_loop()
 
+    # ========== THREAD HAND-OFF ==========
+    def post(self, fn):
+        """Queues fn for the Tk thread; safe from any thread and never blocks.
+
+        root.after from another thread waits for the main loop to serve it,
+        which deadlocks against a Tk thread waiting on that thread (as
+        engine.stop() waits on the writer).
+        """
+        self.inbox.put(fn)
+
+    def pump_inbox(self):
+        while True:
+            try:
+                fn = self.inbox.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                fn()
+            except Exception:
+                self.root.report_callback_exception(*sys.exc_info())
+        if self.is_running:
+            self.root.after(POST_POLL_MS, self.pump_inbox)
+
+    def record_first_paint(self):
+        self.startup_timings = {"first_paint_ms": (time.perf_counter() - START_TIME) * 1000}
+        self.startup_timings.update(self.engine.load_timings)
+        METRICS.observe("first_paint", self.startup_timings["first_paint_ms"])
+        if os.environ.get("FOCUSBELL_TIMING"):
+            status = "OK" if self.startup_timings["first_paint_ms"] <= FIRST_PAINT_TARGET_MS else "OVER TARGET"
+            print(f"Startup timings: {self.startup_timings} (target {FIRST_PAINT_TARGET_MS} ms: {status})")
+        if self.settings.get("fast_start", True):
+            self.root.after_idle(self.setup_styles)
+        if os.environ.get("FOCUSBELL_EXIT_AFTER_PAINT"):
+            # Used by benchmark.py --startup
+            self.root.after_idle(self.root.destroy)
+
+    def on_tasks_loaded(self):
+        self.startup_timings["full_load_ms"] = self.engine.load_timings.get("full_load_ms")
+        if os.environ.get("FOCUSBELL_TIMING"):
+            print(f"Startup timings: {self.startup_timings}")
+        if self.dashboard is not None and self.dashboard.winfo_ismapped():
+            self.refresh_dashboard()
+
+    @property
+    def alarms(self):
+        return self.engine.alarms
+
+    @property
+    def settings(self):
+        return self.engine.settings
+
     def setup_styles(self):
         style = ttk.Style()
         style.theme_use('clam')
@@ -151,65 +332,49 @@ class FocusBellApp:
         style.configure("TCombobox", fieldbackground=THEME["input_bg"], background=THEME["card"],
                         foreground=THEME["fg"], arrowcolor=THEME["accent"], borderwidth=0)
 
-    # ========== DATA PERSISTENCE ==========
-    def save_settings(self):
-        try:
-            with open(SETTINGS_FILE, 'w') as f:
-                json.dump(self.settings, f, indent=4)
-        except Exception as e:
-            print(f"Error saving settings: {e}")
-
-    def load_settings(self):
-        if not os.path.exists(SETTINGS_FILE):
-            return
-        try:
-            with open(SETTINGS_FILE, 'r') as f:
-                data = json.load(f)
-                self.settings.update(data)
-        except Exception as e:
-            print(f"Error loading settings: {e}")
-
-    def save_tasks(self):
-        try:
-            data = [alarm.to_dict() for alarm in self.alarms]
-            with open(DATA_FILE, 'w') as f:
-                json.dump(data, f, indent=4)
-        except Exception as e:
-            print(f"Error saving tasks: {e}")
-
-    def load_tasks(self):
-        if not os.path.exists(DATA_FILE):
-            return
-        
-        try:
-            with open(DATA_FILE, 'r') as f:
-                data = json.load(f)
-                self.alarms = []
-                for item in data:
-                    alarm = Alarm.from_dict(item)
-                    if alarm:
-                        # If loaded task is active but time passed, keep it active (it will trigger immediately)
-                        # or we could auto-move to next day. 
-                        # Current logic: It will trigger immediately if time passed.
-                        self.alarms.append(alarm)
-                
-                self.alarms.sort(key=lambda x: x.alarm_time)
-        except Exception as e:
-            print(f"Error loading tasks: {e}")
-
     # ========== NAVIGATION ==========
     def clear_container(self):
+        # The dashboard (so its cards can be diffed) and the cached views are
+        # kept alive between visits; anything else is rebuilt when shown
+        kept = {self.dashboard, *self.views.values()}
         for widget in self.main_container.winfo_children():
-            widget.destroy()
-
+            if widget in kept:
+                widget.pack_forget()
+            else:
+                widget.destroy()
+
+    def font(self, size, *styles):
+        """Shared named font in THEME["font_main"]; styles: "bold", "italic", "underline"."""
+        key = (size,) + styles
+        named = self.fonts.get(key)
+        if named is None:
+            named = self.fonts[key] = tkfont.Font(
+                root=self.root, family=THEME["font_main"], size=size,
+                weight="bold" if "bold" in styles else "normal",
+                slant="italic" if "italic" in styles else "roman",
+                underline="underline" in styles)
+        return named
+
+    @METRICS.timed("show_dashboard")
     def show_dashboard(self):
         self.clear_container()
-        
+        if self.dashboard is None:
+            self.build_dashboard()
+        self.dashboard.pack(fill="both", expand=True)
+        self.refresh_dashboard()
+
+    def build_dashboard(self):
+        self.dashboard = tk.Frame(self.main_container, bg=THEME["bg"])
+        self.cards = {}        # alarm.id -> AlarmCard
+        self.card_order = []   # alarm ids in packed order
+        self.empty_state = None
+        self.empty_state_filled = False
+
         # Header
-        header = tk.Frame(self.main_container, bg=THEME["bg"])
+        header = tk.Frame(self.dashboard, bg=THEME["bg"])
         header.pack(fill="x", padx=30, pady=(30, 20))
 
-        tk.Label(header, text="My Tasks", font=(THEME["font_main"], 28, "bold"),
+        tk.Label(header, text="My Tasks", font=self.font(28, "bold"),
                  fg=THEME["fg"], bg=THEME["bg"]).pack(side="left")
 
         # Header Right Actions
@@ -217,25 +382,55 @@ class FocusBellApp:
         header_right.pack(side="right")
 
         # Settings Button (Gear)
-        tk.Button(header_right, text="⚙", font=(THEME["font_main"], 14),
+        tk.Button(header_right, text="⚙", font=self.font(14),
                   bg=THEME["bg"], fg=THEME["fg_sub"], activebackground=THEME["bg"], activeforeground=THEME["fg"],
                   relief="flat", cursor="hand2", command=self.show_settings
                   ).pack(side="left", padx=(0, 15))
 
         # Add Button
-        tk.Button(header_right, text="+ New Task", font=(THEME["font_main"], 12, "bold"),
+        tk.Button(header_right, text="+ New Task", font=self.font(12, "bold"),
                   bg=THEME["accent"], fg="#000000", activebackground=THEME["accent_hover"],
                   relief="flat", padx=15, pady=5, cursor="hand2",
                   command=lambda: self.show_editor()
                   ).pack(side="left")
 
+        # Search & Filters
+        filter_bar = tk.Frame(self.dashboard, bg=THEME["bg"])
+        filter_bar.pack(fill="x", padx=30, pady=(0, 5))
+
+        self.search_var = tk.StringVar()
+        self.priority_filter = tk.StringVar(value="All")
+        self.status_filter = tk.StringVar(value="All")
+
+        tk.Label(filter_bar, text="🔍", font=self.font(12),
+                 fg=THEME["fg_sub"], bg=THEME["bg"]).pack(side="left")
+        tk.Entry(filter_bar, textvariable=self.search_var, font=self.font(12),
+                 bg=THEME["input_bg"], fg=THEME["fg"], insertbackground="white",
+                 relief="flat", width=22).pack(side="left", ipady=4, padx=(5, 10))
+        ttk.Combobox(filter_bar, textvariable=self.status_filter, values=list(STATUS_CHOICES),
+                     state="readonly", width=10).pack(side="right")
+        ttk.Combobox(filter_bar, textvariable=self.priority_filter, values=["All", "High", "Medium", "Low"],
+                     state="readonly", width=8).pack(side="right", padx=(0, 8))
+
+        for var in (self.search_var, self.priority_filter, self.status_filter):
+            var.trace_add("write", lambda *_: self.on_filter_changed())
+
         # Task List Area
-        list_frame = tk.Frame(self.main_container, bg=THEME["bg"])
+        list_frame = tk.Frame(self.dashboard, bg=THEME["bg"])
         list_frame.pack(fill="both", expand=True, padx=20, pady=10)
 
+        # Keyed card list (one real card per alarm)
+        self.card_list = tk.Frame(list_frame, bg=THEME["bg"])
+        self.card_list.pack(fill="both", expand=True)
+
+        # Virtualized list (fixed row pool) for large task sets, built on first use
+        self.list_frame = list_frame
+        self.virtual_list = None
+        self.virtual_mode = False
+
         # Canvas for scrolling
-        canvas = tk.Canvas(list_frame, bg=THEME["bg"], highlightthickness=0)
-        scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=canvas.yview)
+        canvas = tk.Canvas(self.card_list, bg=THEME["bg"], highlightthickness=0)
+        scrollbar = ttk.Scrollbar(self.card_list, orient="vertical", command=canvas.yview)
         self.scrollable_frame = tk.Frame(canvas, bg=THEME["bg"])
 
         self.scrollable_frame.bind(
@@ -249,285 +444,561 @@ class FocusBellApp:
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
 
-        # Sort: Active first, then by time
-        sorted_alarms = sorted(self.alarms, key=lambda x: (not x.active, x.alarm_time))
-
-        # Render Items
-        if not sorted_alarms:
-            self.render_empty_state()
-        else:
-            # Check for next upcoming task
-            next_task = next((a for a in sorted_alarms if a.active), None)
-            
-            for alarm in sorted_alarms:
-                is_next = (alarm == next_task)
-                self.render_alarm_item(alarm, is_next)
-
         # Footer / Info
-        footer = tk.Frame(self.main_container, bg=THEME["bg"])
+        footer = tk.Frame(self.dashboard, bg=THEME["bg"])
         footer.pack(side="bottom", fill="x", pady=20, padx=30)
 
-        active_count = sum(1 for a in self.alarms if a.active)
-        tk.Label(footer, text=f"{active_count} Active Tasks", 
-                 font=(THEME["font_main"], 10), fg=THEME["fg_sub"], bg=THEME["bg"]
-                 ).pack(side="left")
+        self.active_count_label = tk.Label(footer, font=self.font(10),
+                                           fg=THEME["fg_sub"], bg=THEME["bg"])
+        self.active_count_label.pack(side="left")
 
-        # Clear Completed
-        if any(not a.active for a in self.alarms):
-             tk.Button(footer, text="Clear Completed", font=(THEME["font_main"], 10),
+        # Clear Completed (only packed while there is something to clear)
+        self.clear_completed_btn = tk.Button(footer, text="Clear Completed", font=self.font(10),
                   bg=THEME["bg"], fg=THEME["fg_sub"], activebackground=THEME["bg"], activeforeground=THEME["danger"],
-                  relief="flat", cursor="hand2", command=self.clear_completed
-                  ).pack(side="left", padx=20)
+                  relief="flat", cursor="hand2", command=self.clear_completed)
 
-        tk.Button(footer, text="Developer Info", font=(THEME["font_main"], 10, "underline"),
+        tk.Button(footer, text="Developer Info", font=self.font(10, "underline"),
                   bg=THEME["bg"], fg=THEME["fg_sub"], activebackground=THEME["bg"], activeforeground=THEME["accent"],
                   relief="flat", cursor="hand2", command=self.show_dev_page
                   ).pack(side="right")
 
+        # Bulk Import / Export, archived tasks
+        for text, command in (("History", self.show_history), ("Export", self.export_tasks),
+                              ("Import", self.import_tasks)):
+            tk.Button(footer, text=text, font=self.font(10),
+                      bg=THEME["bg"], fg=THEME["fg_sub"], activebackground=THEME["bg"], activeforeground=THEME["accent"],
+                      relief="flat", cursor="hand2", command=command
+                      ).pack(side="right", padx=(0, 10))
+
+    def on_filter_changed(self):
+        # Keystroke-to-results latency is recorded as the "search" metric
+        with METRICS.timer("search"):
+            self.refresh_dashboard()
+
+    def filtered_alarms(self):
+        """The alarms to show, in dashboard order (active first, then by time)."""
+        text = self.search_var.get()
+        priority = self.priority_filter.get()
+        status = STATUS_CHOICES[self.status_filter.get()]
+        if not text.strip() and priority == "All" and status == "all":
+            return self.engine.dashboard_order()
+        return self.engine.search(text, None if priority == "All" else priority, status)
+
+    def schedule_refresh(self):
+        # Batches applied in the same Tk loop iteration share one refresh
+        if not self.refresh_pending:
+            self.refresh_pending = True
+            self.root.after_idle(self.run_scheduled_refresh)
+
+    def run_scheduled_refresh(self):
+        self.refresh_pending = False
+        if self.dashboard is not None and self.dashboard.winfo_ismapped():
+            self.refresh_dashboard()
+
+    def refresh_dashboard(self):
+        """Applies the difference between the alarm list and the cards on screen."""
+        if self.dashboard is None:
+            return
+
+        ordered = self.engine.dashboard_order()
+        next_task = ordered[0] if ordered and ordered[0].active else None
+        sorted_alarms = self.filtered_alarms()
+
+        use_virtual = len(sorted_alarms) >= VIRTUAL_LIST_THRESHOLD
+        if use_virtual != self.virtual_mode:
+            self.set_virtual_mode(use_virtual)
+
+        if self.virtual_mode:
+            self.virtual_list.set_items(sorted_alarms, next_task)
+        else:
+            self.diff_cards(sorted_alarms, next_task)
+
+        # Footer
+        active_count = self.engine.active_count()
+        loading = " (loading…)" if self.engine.loading else ""
+        shown = f" · {len(sorted_alarms)} shown" if len(sorted_alarms) != len(ordered) else ""
+        self.active_count_label.config(text=f"{active_count} Active Tasks{shown}{loading}")
+        if self.engine.completed_count():
+            self.clear_completed_btn.pack(side="left", padx=20)
+        else:
+            self.clear_completed_btn.pack_forget()
+
+    def set_virtual_mode(self, enabled):
+        self.virtual_mode = enabled
+        if enabled:
+            if self.virtual_list is None:
+                self.virtual_list = VirtualAlarmList(self, self.list_frame)
+            # Drop the per-alarm cards; the virtual list has its own row pool
+            self.diff_cards([], None)
+            self.card_list.pack_forget()
+            self.virtual_list.frame.pack(fill="both", expand=True)
+        else:
+            self.virtual_list.set_items([], None)
+            self.virtual_list.frame.pack_forget()
+            self.card_list.pack(fill="both", expand=True)
+
+    def diff_cards(self, sorted_alarms, next_task):
+        new_order = [a.id for a in sorted_alarms]
+
+        # Remove cards whose alarm is gone
+        live_ids = set(new_order)
+        for alarm_id in [i for i in self.cards if i not in live_ids]:
+            self.cards.pop(alarm_id).frame.destroy()
+
+        # Empty State (rebuilt when its message would change)
+        if not sorted_alarms and not self.virtual_mode:
+            if self.empty_state is not None and self.empty_state_filled != bool(self.alarms):
+                self.empty_state.destroy()
+                self.empty_state = None
+            if self.empty_state is None:
+                self.render_empty_state()
+                self.empty_state_filled = bool(self.alarms)
+        elif self.empty_state is not None:
+            self.empty_state.destroy()
+            self.empty_state = None
+
+        # Cards that keep their relative order stay put; only the rest get repacked
+        old_pos = {alarm_id: i for i, alarm_id in enumerate(i for i in self.card_order if i in live_ids)}
+        stable = set(longest_increasing_run(new_order, old_pos))
+        first_stable = next((self.cards[i].frame for i in new_order if i in stable), None)
+
+        prev = None
+        now = datetime.now()
+        for alarm in sorted_alarms:
+            card = self.cards.get(alarm.id)
+            is_next = (alarm == next_task)
+            if card is None:
+                card = self.render_alarm_item(alarm, is_next, now)
+            else:
+                self.update_alarm_item(card, alarm, is_next, now)
+
+            if alarm.id not in stable:
+                if prev is not None:
+                    card.frame.pack_configure(after=prev)
+                elif first_stable is not None:
+                    card.frame.pack_configure(before=first_stable)
+            prev = card.frame
+        self.card_order = new_order
+
     def render_empty_state(self):
         frame = tk.Frame(self.scrollable_frame, bg=THEME["bg"])
         frame.pack(pady=50, fill="x")
+        self.empty_state = frame
         
-        tk.Label(frame, text="No tasks yet.", font=(THEME["font_main"], 16),
+        if self.alarms:
+            title, hint = "No matching tasks.", "Try a different search or filter."
+        else:
+            title, hint = "No tasks yet.", "Click '+ New Task' to get started."
+        tk.Label(frame, text=title, font=self.font(16),
                  fg=THEME["fg_sub"], bg=THEME["bg"]).pack()
-        tk.Label(frame, text="Click '+ New Task' to get started.", font=(THEME["font_main"], 12),
+        tk.Label(frame, text=hint, font=self.font(12),
                  fg=THEME["fg_sub"], bg=THEME["bg"]).pack(pady=5)
 
-    def render_alarm_item(self, alarm, is_next=False):
-        bg_color = THEME["card_highlight"] if is_next else THEME["card"]
-        
-        card = tk.Frame(self.scrollable_frame, bg=bg_color)
-        card.pack(fill="x", pady=6, ipady=5)
+    def render_alarm_item(self, alarm, is_next=False, now=None):
+        card = self.build_alarm_card(self.scrollable_frame)
+        card.frame.pack(fill="x", pady=6, ipady=5)
+        self.cards[alarm.id] = card
+        self.update_alarm_item(card, alarm, is_next, now)
+        return card
+
+    def build_alarm_card(self, parent):
+        """Creates the card widgets without binding them to an alarm."""
+        card = AlarmCard()
+        card.frame = tk.Frame(parent)
         
         # Priority Strip
-        p_map = {"High": "prio_high", "Medium": "prio_med", "Low": "prio_low"}
-        p_key = p_map.get(alarm.priority, "prio_med")
-        strip_color = THEME[p_key]
-        
-        tk.Frame(card, bg=strip_color, width=4).pack(side="left", fill="y")
+        card.strip = tk.Frame(card.frame, width=4)
+        card.strip.pack(side="left", fill="y")
 
         # Content Container
-        content = tk.Frame(card, bg=bg_color)
+        content = tk.Frame(card.frame)
         content.pack(side="left", fill="both", expand=True, padx=15, pady=5)
 
         # Top Row: Time & Remaining
-        top_row = tk.Frame(content, bg=bg_color)
+        top_row = tk.Frame(content)
         top_row.pack(fill="x")
 
-        time_color = THEME["accent"] if alarm.active else THEME["fg_sub"]
-        tk.Label(top_row, text=alarm.get_time_str(), font=(THEME["font_main"], 18, "bold"),
-                 fg=time_color, bg=bg_color).pack(side="left")
+        card.time_label = tk.Label(top_row, font=self.font(18, "bold"))
+        card.time_label.pack(side="left")
 
-        if alarm.active:
-            tk.Label(top_row, text=f"• {alarm.get_remaining_str()}", font=(THEME["font_main"], 11),
-                     fg=THEME["fg_sub"], bg=bg_color).pack(side="left", padx=10, pady=(4,0))
-            # Priority Badge (Text)
-            tk.Label(top_row, text=alarm.priority, font=(THEME["font_main"], 9, "bold"),
-                     fg=strip_color, bg=bg_color).pack(side="left", padx=10, pady=(6,0))
-        else:
-             tk.Label(top_row, text="• Completed", font=(THEME["font_main"], 11),
-                     fg=THEME["success"], bg=bg_color).pack(side="left", padx=10, pady=(4,0))
+        card.remaining_label = tk.Label(top_row, font=self.font(11), fg=THEME["fg_sub"])
+        # Priority Badge (Text)
+        card.priority_label = tk.Label(top_row, font=self.font(9, "bold"))
+        card.completed_label = tk.Label(top_row, text="• Completed", font=self.font(11),
+                                        fg=THEME["success"])
 
         # Bottom Row: Task Name
-        tk.Label(content, text=alarm.task_name, font=(THEME["font_main"], 13),
-                 fg=THEME["fg"], bg=bg_color, wraplength=350, justify="left").pack(anchor="w", pady=(2,0))
+        card.name_label = tk.Label(content, font=self.font(13),
+                                   fg=THEME["fg"], wraplength=350, justify="left")
+        card.name_label.pack(anchor="w", pady=(2,0))
 
         # Right: Actions
-        right = tk.Frame(card, bg=bg_color)
+        right = tk.Frame(card.frame)
         right.pack(side="right", padx=15)
 
         # Edit Button
-        tk.Button(right, text="Edit", font=(THEME["font_main"], 9),
+        tk.Button(right, text="Edit", font=self.font(9),
                   bg=THEME["input_bg"], fg=THEME["fg"], relief="flat", width=6,
-                  cursor="hand2", command=lambda a=alarm: self.show_editor(a)
+                  cursor="hand2", command=lambda c=card: self.show_editor(c.alarm)
                   ).pack(side="top", pady=2)
 
         # Delete Button
-        tk.Button(right, text="Delete", font=(THEME["font_main"], 9),
+        tk.Button(right, text="Delete", font=self.font(9),
                   bg=THEME["input_bg"], fg=THEME["danger"], relief="flat", width=6,
-                  cursor="hand2", command=lambda a=alarm: self.delete_alarm(a)
+                  cursor="hand2", command=lambda c=card: self.delete_alarm(c.alarm)
                   ).pack(side="top", pady=2)
 
+        # Widgets that follow the card background
+        card.bg_widgets = [card.frame, content, top_row, card.time_label, card.remaining_label,
+                           card.priority_label, card.completed_label, card.name_label, right]
+        return card
+
+    def update_alarm_item(self, card, alarm, is_next=False, now=None):
+        """Reconfigures only the parts of a card whose inputs changed."""
+        card.alarm = alarm
+        state = (alarm.active, alarm.priority, alarm.get_time_str(), alarm.task_name, is_next,
+                 alarm.get_repeat_str())
+        if state == card.state:
+            if alarm.active:
+                self.update_remaining_label(card, alarm, now)
+            return
+        old = card.state
+        card.state = state
+
+        bg_color = THEME["card_highlight"] if is_next else THEME["card"]
+        if old is None or old[4] != is_next:
+            for widget in card.bg_widgets:
+                widget.config(bg=bg_color)
+
+        p_map = {"High": "prio_high", "Medium": "prio_med", "Low": "prio_low"}
+        strip_color = THEME[p_map.get(alarm.priority, "prio_med")]
+        if old is None or old[1] != alarm.priority or old[5] != state[5]:
+            card.strip.config(bg=strip_color)
+            badge = f"{alarm.priority}  ↻ {state[5]}" if state[5] else alarm.priority
+            card.priority_label.config(text=badge, fg=strip_color)
+
+        if old is None or old[0] != alarm.active:
+            time_color = THEME["accent"] if alarm.active else THEME["fg_sub"]
+            card.time_label.config(fg=time_color)
+            if alarm.active:
+                card.completed_label.pack_forget()
+                card.remaining_label.pack(side="left", padx=10, pady=(4,0))
+                card.priority_label.pack(side="left", padx=10, pady=(6,0))
+            else:
+                card.remaining_label.pack_forget()
+                card.priority_label.pack_forget()
+                card.completed_label.pack(side="left", padx=10, pady=(4,0))
+
+        if old is None or old[2] != state[2]:
+            card.time_label.config(text=state[2])
+        if old is None or old[3] != alarm.task_name:
+            card.name_label.config(text=alarm.task_name)
+        if alarm.active:
+            self.update_remaining_label(card, alarm, now)
+
+    def update_remaining_label(self, card, alarm, now=None):
+        text = f"• {alarm.get_remaining_str(now)}"
+        if text != card.remaining_text:
+            card.remaining_text = text
+            card.remaining_label.config(text=text)
+
     def show_editor(self, alarm=None):
         self.clear_container()
-        is_edit = alarm is not None
-        
+        if "editor" not in self.views:
+            self.build_editor()
+        self.fill_editor(alarm)
+        self.views["editor"].pack(fill="both", expand=True)
+        self.task_entry.focus()
+
+    def build_editor(self):
+        """Builds the task form once; fill_editor() loads a task into it on every visit."""
+        view = self.views["editor"] = tk.Frame(self.main_container, bg=THEME["bg"])
+        form_vars = self.editor_vars = {}
+
         # Header
-        header_text = "Edit Task" if is_edit else "New Task"
-        tk.Label(self.main_container, text=header_text, font=(THEME["font_main"], 24, "bold"),
-                 fg=THEME["fg"], bg=THEME["bg"]).pack(pady=(40, 30))
+        self.editor_title = tk.Label(view, font=self.font(24, "bold"), fg=THEME["fg"], bg=THEME["bg"])
+        self.editor_title.pack(pady=(40, 30))
 
         # Form Container
-        form = tk.Frame(self.main_container, bg=THEME["bg"])
+        form = tk.Frame(view, bg=THEME["bg"])
         form.pack()
 
         # --- Task Name Input ---
-        tk.Label(form, text="Task Description", font=(THEME["font_main"], 12),
+        tk.Label(form, text="Task Description", font=self.font(12),
                  fg=THEME["fg_sub"], bg=THEME["bg"]).pack(anchor="w", pady=(0, 5))
         
-        task_var = tk.StringVar(value=alarm.task_name if is_edit else "")
-        task_entry = tk.Entry(form, textvariable=task_var, font=(THEME["font_main"], 14),
+        task_var = form_vars["task"] = tk.StringVar()
+        self.task_entry = tk.Entry(form, textvariable=task_var, font=self.font(14),
                               bg=THEME["input_bg"], fg=THEME["fg"], insertbackground="white",
                               relief="flat", width=30)
-        task_entry.pack(ipady=8, pady=(0, 20))
-        task_entry.focus()
+        self.task_entry.pack(ipady=8, pady=(0, 20))
 
         # --- Time Input ---
-        tk.Label(form, text="Set Time", font=(THEME["font_main"], 12),
+        tk.Label(form, text="Set Time", font=self.font(12),
                  fg=THEME["fg_sub"], bg=THEME["bg"]).pack(anchor="w", pady=(0, 5))
 
         time_frame = tk.Frame(form, bg=THEME["bg"])
         time_frame.pack(anchor="w", pady=(0, 20))
 
-        # Defaults
-        def_h, def_m, def_ampm = "09", "00", "AM"
-        if is_edit:
-            t = alarm.alarm_time
-            def_h = t.strftime("%I")
-            def_m = t.strftime("%M")
-            def_ampm = t.strftime("%p")
-
         # Hours
-        hour_var = tk.StringVar(value=def_h)
+        hour_var = form_vars["hour"] = tk.StringVar()
         hours = [f"{i:02d}" for i in range(1, 13)]
         h_cb = ttk.Combobox(time_frame, textvariable=hour_var, values=hours, width=4, 
-                            font=(THEME["font_main"], 16), state="readonly", justify="center")
+                            font=self.font(16), state="readonly", justify="center")
         h_cb.pack(side="left", padx=(0, 5))
 
-        tk.Label(time_frame, text=":", font=(THEME["font_main"], 16, "bold"),
+        tk.Label(time_frame, text=":", font=self.font(16, "bold"),
                  fg=THEME["fg"], bg=THEME["bg"]).pack(side="left")
 
         # Minutes
-        min_var = tk.StringVar(value=def_m)
+        min_var = form_vars["minute"] = tk.StringVar()
         minutes = [f"{i:02d}" for i in range(0, 60)]
         m_cb = ttk.Combobox(time_frame, textvariable=min_var, values=minutes, width=4, 
-                            font=(THEME["font_main"], 16), state="readonly", justify="center")
+                            font=self.font(16), state="readonly", justify="center")
         m_cb.pack(side="left", padx=5)
 
         # AM/PM
-        ampm_var = tk.StringVar(value=def_ampm)
+        ampm_var = form_vars["ampm"] = tk.StringVar()
         ampm_cb = ttk.Combobox(time_frame, textvariable=ampm_var, values=["AM", "PM"], width=5, 
-                               font=(THEME["font_main"], 16), state="readonly", justify="center")
+                               font=self.font(16), state="readonly", justify="center")
         ampm_cb.pack(side="left", padx=5)
 
         # --- Priority Input ---
-        tk.Label(form, text="Priority", font=(THEME["font_main"], 12),
+        tk.Label(form, text="Priority", font=self.font(12),
                  fg=THEME["fg_sub"], bg=THEME["bg"]).pack(anchor="w", pady=(0, 5))
         
-        prio_var = tk.StringVar(value=alarm.priority if is_edit else "Medium")
+        prio_var = form_vars["priority"] = tk.StringVar()
         prio_cb = ttk.Combobox(form, textvariable=prio_var, values=["High", "Medium", "Low"], 
-                               font=(THEME["font_main"], 14), state="readonly", width=15)
+                               font=self.font(14), state="readonly", width=15)
         prio_cb.pack(anchor="w", pady=(0, 20))
 
+        # --- Repeat Input ---
+        tk.Label(form, text="Repeat", font=self.font(12),
+                 fg=THEME["fg_sub"], bg=THEME["bg"]).pack(anchor="w", pady=(0, 5))
+
+        repeat_var = form_vars["repeat"] = tk.StringVar(value="Never")
+        repeat_cb = ttk.Combobox(form, textvariable=repeat_var, values=list(REPEAT_CHOICES),
+                                 font=self.font(14), state="readonly", width=15)
+        repeat_cb.pack(anchor="w", pady=(0, 5))
+
+        # Extra options, shown for the rules that need them
+        repeat_opts = tk.Frame(form, bg=THEME["bg"])
+        repeat_opts.pack(anchor="w", pady=(0, 20))
+
+        every_var = form_vars["every"] = tk.StringVar()
+        every_frame = tk.Frame(repeat_opts, bg=THEME["bg"])
+        tk.Label(every_frame, text="Every", font=self.font(12),
+                 fg=THEME["fg"], bg=THEME["bg"]).pack(side="left")
+        tk.Spinbox(every_frame, from_=1, to=23, textvariable=every_var, width=4,
+                   font=self.font(12), bg=THEME["input_bg"], fg=THEME["fg"],
+                   buttonbackground=THEME["input_bg"], relief="flat").pack(side="left", padx=5)
+        tk.Label(every_frame, text="hours", font=self.font(12),
+                 fg=THEME["fg"], bg=THEME["bg"]).pack(side="left")
+
+        day_vars = form_vars["days"] = []
+        days_frame = tk.Frame(repeat_opts, bg=THEME["bg"])
+        for name in WEEKDAY_NAMES:
+            var = tk.BooleanVar()
+            day_vars.append(var)
+            tk.Checkbutton(days_frame, text=name, variable=var, font=self.font(10),
+                           fg=THEME["fg"], bg=THEME["bg"], selectcolor=THEME["input_bg"],
+                           activebackground=THEME["bg"], activeforeground=THEME["fg"]
+                           ).pack(side="left")
+
+        def show_repeat_opts(*_):
+            kind = REPEAT_CHOICES[repeat_var.get()]
+            every_frame.pack_forget()
+            days_frame.pack_forget()
+            if kind == "hours":
+                every_frame.pack(anchor="w")
+            elif kind == "days":
+                days_frame.pack(anchor="w")
+        repeat_var.trace_add("write", show_repeat_opts)
+
+        def get_repeat():
+            kind = REPEAT_CHOICES[repeat_var.get()]
+            if kind is None:
+                return None
+            return (kind, every_var.get(), [i for i, var in enumerate(day_vars) if var.get()])
+
         # --- Actions ---
-        btn_frame = tk.Frame(self.main_container, bg=THEME["bg"])
+        btn_frame = tk.Frame(view, bg=THEME["bg"])
         btn_frame.pack(pady=20)
 
-        # Save Button
-        tk.Button(btn_frame, text="Save Task", font=(THEME["font_main"], 14, "bold"),
+        # Save Button (saves whichever task the form was last filled with)
+        tk.Button(btn_frame, text="Save Task", font=self.font(14, "bold"),
                   bg=THEME["accent"], fg="#000000", activebackground=THEME["accent_hover"],
                   relief="flat", width=15, cursor="hand2",
-                  command=lambda: self.save_alarm(alarm, task_var.get(), hour_var.get(), min_var.get(), ampm_var.get(), prio_var.get())
+                  command=lambda: self.save_alarm(self.editing_alarm, task_var.get(), hour_var.get(), min_var.get(), ampm_var.get(), prio_var.get(), get_repeat())
                   ).pack(side="left", padx=10)
 
         # Cancel Button
-        tk.Button(btn_frame, text="Cancel", font=(THEME["font_main"], 14),
+        tk.Button(btn_frame, text="Cancel", font=self.font(14),
                   bg=THEME["input_bg"], fg=THEME["fg"], activebackground=THEME["card"], activeforeground=THEME["fg"],
                   relief="flat", width=10, cursor="hand2",
                   command=self.show_dashboard
                   ).pack(side="left", padx=10)
 
+    def fill_editor(self, alarm):
+        """Resets the cached form to alarm's values, or to a blank new task."""
+        self.editing_alarm = alarm
+        form_vars = self.editor_vars
+        self.editor_title.config(text="Edit Task" if alarm else "New Task")
+        form_vars["task"].set(alarm.task_name if alarm else "")
+
+        # Defaults
+        def_h, def_m, def_ampm = "09", "00", "AM"
+        if alarm:
+            t = alarm.alarm_time
+            def_h = t.strftime("%I")
+            def_m = t.strftime("%M")
+            def_ampm = t.strftime("%p")
+        form_vars["hour"].set(def_h)
+        form_vars["minute"].set(def_m)
+        form_vars["ampm"].set(def_ampm)
+        form_vars["priority"].set(alarm.priority if alarm else "Medium")
+
+        rule = alarm.recurrence if alarm else None
+        form_vars["every"].set(str(rule["every"]) if rule and rule["kind"] == "hours" else "2")
+        picked = rule["days"] if rule and rule["kind"] == "days" else []
+        for i, var in enumerate(form_vars["days"]):
+            var.set(i in picked)
+        # Setting the rule last re-runs show_repeat_opts
+        form_vars["repeat"].set(REPEAT_LABELS[rule["kind"]] if rule else "Never")
+
     # ========== LOGIC ==========
-    def save_alarm(self, existing_alarm, task_name, hour, minute, ampm, priority):
+    def save_alarm(self, existing_alarm, task_name, hour, minute, ampm, priority, repeat=None):
         task_name = task_name.strip()
         if not task_name:
             messagebox.showwarning("Required", "Please enter a task description.")
             return
 
         try:
-            h = int(hour)
-            m = int(minute)
-            
-            # Convert to 24h for storage
-            if ampm == "PM" and h != 12: h += 12
-            if ampm == "AM" and h == 12: h = 0
-
-            now = datetime.now()
-            alarm_dt = now.replace(hour=h, minute=m, second=0, microsecond=0)
-            
-            # If time passed, assume tomorrow
-            if alarm_dt <= now:
-                alarm_dt += timedelta(days=1)
-
-            if existing_alarm:
-                # Update
-                existing_alarm.task_name = task_name
-                existing_alarm.alarm_time = alarm_dt
-                existing_alarm.active = True # Reactivate on edit
-                existing_alarm.priority = priority
-            else:
-                # Create New
-                new_alarm = Alarm(task_name, alarm_dt, priority=priority)
-                self.alarms.append(new_alarm)
-
-            self.save_tasks() # PERSIST
-            self.show_dashboard()
-
+            alarm_dt = alarm_time_from_clock(hour, minute, ampm, self.engine.clock.now())
         except ValueError:
             messagebox.showerror("Error", "Invalid time format.")
+            return
+
+        recurrence = None
+        if repeat:
+            kind, every, days = repeat
+            try:
+                recurrence = make_recurrence(kind, alarm_dt, every=every, days=days)
+            except ValueError as e:
+                messagebox.showerror("Error", str(e))
+                return
+
+        if existing_alarm:
+            self.engine.update_alarm(existing_alarm, task_name, alarm_dt, priority, recurrence)
+        else:
+            self.engine.add_alarm(task_name, alarm_dt, priority, recurrence)
+        self.show_dashboard()
 
     def delete_alarm(self, alarm):
         if messagebox.askyesno("Delete Task", f"Delete '{alarm.task_name}'?"):
-            if alarm in self.alarms:
-                self.alarms.remove(alarm)
-                self.save_tasks() # PERSIST
+            if self.engine.delete_alarm(alarm):
                 self.show_dashboard()
 
     def clear_completed(self):
-        if messagebox.askyesno("Clear Completed", "Remove all completed tasks?"):
-            self.alarms = [a for a in self.alarms if a.active]
-            self.save_tasks()
+        if messagebox.askyesno("Clear Completed", "Move all completed tasks to History?"):
+            self.engine.clear_completed()
             self.show_dashboard()
 
+    def import_tasks(self):
+        path = filedialog.askopenfilename(title="Import Tasks", filetypes=TRANSFER_FILETYPES)
+        if not path:
+            return
+
+        # Parse off the Tk thread, then commit and refresh once
+        def parse():
+            try:
+                import transfer
+                alarms = transfer.read_alarms(path)
+            except Exception as e:
+                message = str(e)  # e is unbound once the except block ends
+                self.post(lambda: messagebox.showerror("Import Failed", message))
+                return
+            self.post(lambda: finish(alarms))
+
+        def finish(alarms):
+            added, updated, past = self.engine.import_alarms(alarms)
+            self.refresh_dashboard()
+            message = f"Imported {added} new and {updated} updated tasks."
+            if past:
+                message += f"\n{past} already past were marked completed."
+            messagebox.showinfo("Import", message)
+
+        threading.Thread(target=parse, daemon=True).start()
+
+    def export_tasks(self):
+        path = filedialog.asksaveasfilename(title="Export Tasks", filetypes=TRANSFER_FILETYPES,
+                                            defaultextension=".csv")
+        if not path:
+            return
+        try:
+            import transfer
+            transfer.write_alarms(self.engine.snapshot(), path)
+        except Exception as e:
+            messagebox.showerror("Export Failed", str(e))
+
     def show_settings(self):
         self.clear_container()
-        
+        if "settings" not in self.views:
+            self.build_settings()
+        self.fill_settings()
+        self.views["settings"].pack(fill="both", expand=True)
+
+    def build_settings(self):
+        """Builds the settings form once; fill_settings() reloads the saved values on every visit."""
+        view = self.views["settings"] = tk.Frame(self.main_container, bg=THEME["bg"])
+        form_vars = self.settings_vars = {}
+
         # Header
-        tk.Label(self.main_container, text="Settings", font=(THEME["font_main"], 24, "bold"),
+        tk.Label(view, text="Settings", font=self.font(24, "bold"),
                  fg=THEME["fg"], bg=THEME["bg"]).pack(pady=(40, 30))
 
         # Form
-        form = tk.Frame(self.main_container, bg=THEME["bg"])
+        form = tk.Frame(view, bg=THEME["bg"])
         form.pack()
 
         # Snooze Duration
-        tk.Label(form, text="Snooze Duration (minutes)", font=(THEME["font_main"], 12),
+        tk.Label(form, text="Snooze Duration (minutes)", font=self.font(12),
                  fg=THEME["fg_sub"], bg=THEME["bg"]).pack(anchor="w", pady=(0, 5))
         
-        snooze_var = tk.StringVar(value=str(self.settings.get("snooze_min", 5)))
-        snooze_entry = tk.Entry(form, textvariable=snooze_var, font=(THEME["font_main"], 14),
+        snooze_var = form_vars["snooze"] = tk.StringVar()
+        snooze_entry = tk.Entry(form, textvariable=snooze_var, font=self.font(14),
                               bg=THEME["input_bg"], fg=THEME["fg"], insertbackground="white",
                               relief="flat", width=10)
         snooze_entry.pack(anchor="w", ipady=5, pady=(0, 20))
 
         # Sound Toggle
-        sound_var = tk.BooleanVar(value=self.settings.get("sound_enabled", True))
+        sound_var = form_vars["sound"] = tk.BooleanVar()
         
-        def toggle_sound():
-            sound_var.set(not sound_var.get())
+        def show_sound():
             btn_text = "🔊 Sound On" if sound_var.get() else "🔇 Sound Off"
             btn_fg = THEME["success"] if sound_var.get() else THEME["fg_sub"]
             sound_btn.config(text=btn_text, fg=btn_fg)
+
+        def toggle_sound():
+            sound_var.set(not sound_var.get())
+            show_sound()
             
-        sound_btn = tk.Button(form, text="🔊 Sound On" if sound_var.get() else "🔇 Sound Off",
-                              font=(THEME["font_main"], 14),
-                              bg=THEME["input_bg"], fg=THEME["success"] if sound_var.get() else THEME["fg_sub"],
+        sound_btn = tk.Button(form, font=self.font(14),
+                              bg=THEME["input_bg"],
                               relief="flat", width=15, cursor="hand2",
                               command=toggle_sound)
         sound_btn.pack(anchor="w", pady=(0, 20))
+        self.show_sound_setting = show_sound
+
+        # Missed alarms (after sleep, a clock change or while the app was closed)
+        tk.Label(form, text="Missed Alarms", font=self.font(12),
+                 fg=THEME["fg_sub"], bg=THEME["bg"]).pack(anchor="w", pady=(0, 5))
+        catch_up_var = form_vars["catch_up"] = tk.StringVar()
+        ttk.Combobox(form, textvariable=catch_up_var, values=list(CATCH_UP_CHOICES),
+                     width=18, state="readonly").pack(anchor="w", pady=(0, 20))
 
         # Actions
-        btn_frame = tk.Frame(self.main_container, bg=THEME["bg"])
+        btn_frame = tk.Frame(view, bg=THEME["bg"])
         btn_frame.pack(pady=20)
 
         def save_and_exit():
@@ -536,131 +1007,273 @@ class FocusBellApp:
                 if val < 1: val = 1
                 self.settings["snooze_min"] = val
                 self.settings["sound_enabled"] = sound_var.get()
-                self.save_settings()
+                self.settings["catch_up"] = CATCH_UP_CHOICES[catch_up_var.get()]
+                self.engine.save_settings()
                 self.show_dashboard()
             except ValueError:
                 messagebox.showerror("Error", "Invalid snooze duration")
 
         # Save
-        tk.Button(btn_frame, text="Save Settings", font=(THEME["font_main"], 14, "bold"),
+        tk.Button(btn_frame, text="Save Settings", font=self.font(14, "bold"),
                   bg=THEME["accent"], fg="#000000", activebackground=THEME["accent_hover"],
                   relief="flat", width=15, cursor="hand2",
                   command=save_and_exit
                   ).pack(side="left", padx=10)
 
+        # Metrics (collected when metrics_enabled is set or FOCUSBELL_METRICS is exported)
+        tk.Button(form, text="Export Metrics…", font=self.font(10, "underline"),
+                  bg=THEME["bg"], fg=THEME["fg_sub"], activebackground=THEME["bg"], activeforeground=THEME["accent"],
+                  relief="flat", cursor="hand2", command=self.export_metrics
+                  ).pack(anchor="w")
+
         # Cancel
-        tk.Button(btn_frame, text="Cancel", font=(THEME["font_main"], 14),
+        tk.Button(btn_frame, text="Cancel", font=self.font(14),
                   bg=THEME["input_bg"], fg=THEME["fg"], activebackground=THEME["card"], activeforeground=THEME["fg"],
                   relief="flat", width=10, cursor="hand2",
                   command=self.show_dashboard
                   ).pack(side="left", padx=10)
 
-    # ========== BACKGROUND CHECK & REFRESH ==========
-    def alarm_check_loop(self):
-        while self.is_running:
-            now = datetime.now()
-            triggered_alarm = None
-            
-            # Check for triggers
-            for alarm in self.alarms:
-                if alarm.active and now >= alarm.alarm_time:
-                    triggered_alarm = alarm
-                    break
-            
-            if triggered_alarm:
-                # Only mark inactive if we don't have snoozing logic handled in the UI
-                # But here we trigger UI, which will handle the logic
-                self.root.after(0, lambda: self.trigger_alarm_ui(triggered_alarm))
-                # Temporary sleep to prevent multiple triggers before UI opens
-                time.sleep(2)
+    def fill_settings(self):
+        """Discards unsaved edits: the form shows the saved settings again."""
+        form_vars = self.settings_vars
+        form_vars["snooze"].set(str(self.settings.get("snooze_min", 5)))
+        form_vars["sound"].set(self.settings.get("sound_enabled", True))
+        self.show_sound_setting()
+        policy = self.settings.get("catch_up", "all")
+        form_vars["catch_up"].set(next((label for label, p in CATCH_UP_CHOICES.items() if p == policy), "Ring all"))
+
+    def export_metrics(self):
+        if not METRICS.enabled:
+            messagebox.showinfo("Metrics", "Metrics are off. Set \"metrics_enabled\": true in settings.json "
+                                           "or FOCUSBELL_METRICS=1 and restart.")
+            return
+        path = filedialog.asksaveasfilename(title="Export Metrics", defaultextension=".json",
+                                            filetypes=[("JSON", "*.json"), ("Prometheus text", "*.prom")])
+        if not path:
+            return
+        try:
+            self.engine.export_metrics(path)
+        except Exception as e:
+            messagebox.showerror("Export Failed", str(e))
+
+    # ========== HISTORY ==========
+    def show_history(self):
+        """Archived tasks, one month at a time; partitions are read only here."""
+        self.clear_container()
+
+        tk.Label(self.main_container, text="History", font=self.font(24, "bold"),
+                 fg=THEME["fg"], bg=THEME["bg"]).pack(pady=(40, 20))
+
+        months = self.engine.history_months()
+        body = tk.Frame(self.main_container, bg=THEME["bg"])
+        body.pack(fill="both", expand=True, padx=30)
 
-            time.sleep(1)
+        if not months:
+            tk.Label(body, text="Completed tasks move here once they are a few days old.",
+                     font=self.font(12), fg=THEME["fg_sub"], bg=THEME["bg"]).pack(pady=40)
+        else:
+            month_var = tk.StringVar(value=months[0])
+            bar = tk.Frame(body, bg=THEME["bg"])
+            bar.pack(fill="x", pady=(0, 10))
+            month_cb = ttk.Combobox(bar, textvariable=month_var, values=months, width=10, state="readonly")
+            month_cb.pack(side="left")
+            count_label = tk.Label(bar, font=self.font(10), fg=THEME["fg_sub"], bg=THEME["bg"])
+            count_label.pack(side="right")
+
+            # A Listbox draws only what is visible, so a busy month stays cheap
+            rows = tk.Frame(body, bg=THEME["bg"])
+            rows.pack(fill="both", expand=True)
+            listbox = tk.Listbox(rows, font=self.font(11), bg=THEME["card"], fg=THEME["fg"],
+                                 selectbackground=THEME["card_highlight"], highlightthickness=0,
+                                 relief="flat", activestyle="none")
+            scrollbar = ttk.Scrollbar(rows, orient="vertical", command=listbox.yview)
+            listbox.config(yscrollcommand=scrollbar.set)
+            scrollbar.pack(side="right", fill="y")
+            listbox.pack(side="left", fill="both", expand=True)
+
+            def show_month(_event=None):
+                alarms = self.engine.load_history(month_var.get())
+                listbox.delete(0, "end")
+                listbox.insert("end", *(f"{a.alarm_time.strftime('%a %d')}  {a.get_time_str()}   "
+                                        f"[{a.priority}]  {a.task_name}" for a in alarms))
+                count_label.config(text=f"{len(alarms)} completed tasks")
+
+            month_cb.bind("<<ComboboxSelected>>", show_month)
+            show_month()
+
+        tk.Button(self.main_container, text="Back", font=self.font(14),
+                  bg=THEME["input_bg"], fg=THEME["fg"], activebackground=THEME["card"], activeforeground=THEME["fg"],
+                  relief="flat", width=10, cursor="hand2", command=self.show_dashboard
+                  ).pack(pady=20)
 
+    # ========== REFRESH ==========
     def refresh_ui_loop(self):
-        """Refreshes the dashboard every minute to update 'time remaining'"""
-        if self.is_running:
-            # If dashboard is visible (simple check: if we are not editing)
-            # This is a bit hacky, better state management would be good
-            # But for now, just calling show_dashboard if it's the current view is safe enough
-            # We can check if 'New Task' button exists to know we are on dashboard
-            try:
-                # Re-render to update times
-                # To avoid disrupting user interaction, maybe only update labels?
-                # For simplicity, we just won't auto-refresh the whole UI to avoid glitches.
-                # The user can refresh by navigating.
-                # OR we update the text of labels if we stored references.
-                pass 
-            except:
-                pass
-            self.root.after(60000, self.refresh_ui_loop)
+        """Updates 'time remaining' labels on every minute boundary"""
+        if not self.is_running:
+            return
+
+        # One snapshot for every label in this tick
+        now = datetime.now()
+        if self.dashboard is not None and self.dashboard.winfo_ismapped():
+            self.update_countdowns(now)
+
+        # Hourly: move completed tasks past "archive_after_days" to History
+        if now.minute == 0 and not self.engine.loading:
+            self.engine.archive_old()
+
+        # Re-arm just past the next minute boundary
+        delay_ms = (60 - now.second) * 1000 - now.microsecond // 1000 + 50
+        self.root.after(delay_ms, self.refresh_ui_loop)
+
+    def update_countdowns(self, now):
+        # Only text changes; no widgets are created or repacked
+        if self.virtual_mode:
+            cards = self.virtual_list.visible_cards()
+        else:
+            cards = self.cards.values()
+        for card in cards:
+            if card.alarm.active:
+                self.update_remaining_label(card, card.alarm, now)
 
     # ========== FULL SCREEN TRIGGER ==========
-    def trigger_alarm_ui(self, alarm):
-        # Deactivate alarm temporarily so it doesn't re-trigger while window is open
-        # We will set it to False. If Snooze, we set it True with new time.
-        alarm.active = False
-        self.save_tasks()
-        
+    @METRICS.timed("trigger_window")
+    def trigger_alarm_ui(self, alarms):
+        # How long the alarms waited for the Tk loop (vs. trigger_lateness on the checker)
+        METRICS.observe_lateness("ui_lateness", alarms)
+
+        # Deactivate alarms so they don't re-trigger while the window is open (one write).
+        # Stale or repeated triggers come back empty.
+        alarms = self.engine.mark_fired(alarms)
+        if not alarms:
+            return
+
+        # Alarms falling due while the window is up join the same window
+        if self.alarm_window is not None:
+            self.ringing.extend(alarms)
+            self.ringing.sort(key=trigger_key)
+            self.refresh_trigger_window()
+            return
+        self.ringing = list(alarms)
+
         # Open Alarm Window
         alarm_win = tk.Toplevel(self.root)
         alarm_win.attributes("-fullscreen", True)
         alarm_win.configure(bg=THEME["bg"])
         alarm_win.lift()
         alarm_win.focus_force()
+        # Closing through the window manager snoozes, so nothing is left ringing unseen
+        alarm_win.protocol("WM_DELETE_WINDOW", lambda: self.snooze_alarm(list(self.ringing)))
+        self.alarm_window = alarm_win
 
         # Play Sound
         if self.settings.get("sound_enabled", True):
-            sound_path = resource_path("alarm.wav")
-            try:
-                winsound.PlaySound(sound_path, winsound.SND_FILENAME | winsound.SND_LOOP | winsound.SND_ASYNC)
-            except Exception:
-                pass
+            self.audio.play()
 
         # Content
-        tk.Label(alarm_win, text="⏰ IT'S TIME! ⏰", font=(THEME["font_main"], 48, "bold"),
+        tk.Label(alarm_win, text="⏰ IT'S TIME! ⏰", font=self.font(48, "bold"),
                  fg=THEME["danger"], bg=THEME["bg"]).pack(pady=(60, 20))
 
-        tk.Label(alarm_win, text=alarm.task_name, font=(THEME["font_main"], 64, "bold"),
-                 fg=THEME["accent"], bg=THEME["bg"], wraplength=1200, justify="center").pack(expand=True)
-
-        tk.Label(alarm_win, text=f"Scheduled for {alarm.get_time_str()}", font=(THEME["font_main"], 20),
-                 fg=THEME["fg_sub"], bg=THEME["bg"]).pack(pady=10)
-
-        # Buttons Frame
+        # Buttons Frame (packed before the rows so a long batch can't push it off screen)
         btn_frame = tk.Frame(alarm_win, bg=THEME["bg"])
-        btn_frame.pack(pady=60)
+        btn_frame.pack(side="bottom", pady=60)
 
-        # Snooze Button
-        mins = self.settings.get("snooze_min", 5)
-        snooze_btn = tk.Button(btn_frame, text=f"Snooze {mins}m", font=(THEME["font_main"], 20, "bold"),
+        self.trigger_rows = tk.Frame(alarm_win, bg=THEME["bg"])
+        self.trigger_rows.pack(expand=True)
+
+        # Snooze Button (all ringing alarms)
+        self.snooze_all_btn = tk.Button(btn_frame, font=self.font(20, "bold"),
                              bg=THEME["warning"], fg="#000000", activebackground="#FFCC80",
                              relief="flat", width=12, height=2, cursor="hand2",
-                             command=lambda: self.snooze_alarm(alarm, alarm_win)
+                             command=lambda: self.snooze_alarm(list(self.ringing))
                              )
-        snooze_btn.pack(side="left", padx=20)
+        self.snooze_all_btn.pack(side="left", padx=20)
 
-        # Complete Button
-        stop_btn = tk.Button(btn_frame, text="COMPLETE", font=(THEME["font_main"], 24, "bold"),
+        # Complete Button (all ringing alarms)
+        self.complete_all_btn = tk.Button(btn_frame, font=self.font(24, "bold"),
                              bg=THEME["success"], fg="#FFFFFF", activebackground="#00A040", activeforeground="#FFFFFF",
                              relief="flat", width=14, height=2, cursor="hand2",
-                             command=lambda: self.stop_alarm(alarm_win)
+                             command=lambda: self.stop_alarm(list(self.ringing))
                              )
-        stop_btn.pack(side="left", padx=20)
+        self.complete_all_btn.pack(side="left", padx=20)
+
+        self.refresh_trigger_window()
+
+    def refresh_trigger_window(self):
+        for widget in self.trigger_rows.winfo_children():
+            widget.destroy()
 
-    def snooze_alarm(self, alarm, window):
-        winsound.PlaySound(None, winsound.SND_PURGE)
-        window.destroy()
-        
         mins = self.settings.get("snooze_min", 5)
-        alarm.alarm_time = datetime.now() + timedelta(minutes=mins)
-        alarm.active = True
-        self.save_tasks()
+        single = len(self.ringing) == 1
+        if single:
+            # One alarm keeps the big layout
+            alarm = self.ringing[0]
+            tk.Label(self.trigger_rows, text=alarm.task_name, font=self.font(64, "bold"),
+                     fg=THEME["accent"], bg=THEME["bg"], wraplength=1200, justify="center").pack(expand=True)
+
+            tk.Label(self.trigger_rows, text=f"Scheduled for {alarm.get_time_str()}", font=self.font(20),
+                     fg=THEME["fg_sub"], bg=THEME["bg"]).pack(pady=10)
+        else:
+            for alarm in self.ringing[:TRIGGER_ROW_LIMIT]:
+                row = tk.Frame(self.trigger_rows, bg=THEME["card"])
+                row.pack(fill="x", pady=6, ipady=5)
+
+                p_map = {"High": "prio_high", "Medium": "prio_med", "Low": "prio_low"}
+                tk.Frame(row, bg=THEME[p_map.get(alarm.priority, "prio_med")], width=4).pack(side="left", fill="y")
+
+                tk.Label(row, text=alarm.get_time_str(), font=self.font(18, "bold"),
+                         fg=THEME["fg_sub"], bg=THEME["card"]).pack(side="left", padx=15)
+                tk.Label(row, text=alarm.task_name, font=self.font(24, "bold"),
+                         fg=THEME["accent"], bg=THEME["card"], wraplength=700, justify="left"
+                         ).pack(side="left", padx=10)
+
+                tk.Button(row, text="Complete", font=self.font(12, "bold"),
+                          bg=THEME["success"], fg="#FFFFFF", relief="flat", width=10, cursor="hand2",
+                          command=lambda a=alarm: self.stop_alarm([a])
+                          ).pack(side="right", padx=(5, 15))
+                tk.Button(row, text=f"Snooze {mins}m", font=self.font(12, "bold"),
+                          bg=THEME["warning"], fg="#000000", relief="flat", width=10, cursor="hand2",
+                          command=lambda a=alarm: self.snooze_alarm([a])
+                          ).pack(side="right", padx=5)
+
+            hidden = len(self.ringing) - TRIGGER_ROW_LIMIT
+            if hidden > 0:
+                tk.Label(self.trigger_rows, text=f"… and {hidden} more", font=self.font(18, "bold"),
+                         fg=THEME["fg_sub"], bg=THEME["bg"]).pack(pady=10)
+
+        self.snooze_all_btn.config(text=f"Snooze {mins}m" if single else "Snooze All")
+        self.complete_all_btn.config(text="COMPLETE" if single else "COMPLETE ALL")
+
+    def show_catch_up(self, alarms):
+        """Lists missed alarms that the catch-up policy handled without ringing."""
+        lines = [f"{a.get_time_str()}  {a.task_name}" for a in sorted(alarms, key=dashboard_key)[:15]]
+        if len(alarms) > 15:
+            lines.append(f"… and {len(alarms) - 15} more")
+        self.refresh_dashboard()
+        messagebox.showinfo("Missed Alarms", f"{len(alarms)} alarm(s) were missed:\n\n" + "\n".join(lines))
+
+    def release_alarms(self, alarms):
+        """Drops alarms from the trigger window; closes it once nothing is ringing."""
+        self.ringing = [a for a in self.ringing if a not in alarms]
+        if self.ringing:
+            self.refresh_trigger_window()
+            return False
+        self.audio.stop()
+        self.alarm_window.destroy()
+        self.alarm_window = None
+        return True
+
+    def snooze_alarm(self, alarms):
+        mins = self.settings.get("snooze_min", 5)
+        self.engine.snooze_alarms(alarms, mins)
+        closed = self.release_alarms(alarms)
         self.show_dashboard()
-        messagebox.showinfo("Snoozed", f"Alarm snoozed for {mins} minutes.\nNew time: {alarm.get_time_str()}")
+        if closed:
+            new_time = alarms[0].get_time_str()
+            messagebox.showinfo("Snoozed", f"Alarm snoozed for {mins} minutes.\nNew time: {new_time}")
 
-    def stop_alarm(self, window):
-        winsound.PlaySound(None, winsound.SND_PURGE)
-        window.destroy()
+    def stop_alarm(self, alarms):
+        # Fired alarms are already inactive, so completing is just closing them out
+        self.release_alarms(alarms)
         self.show_dashboard() # Return to dashboard and refresh
 
     # ========== DEV PAGE ==========
@@ -676,36 +1289,40 @@ class FocusBellApp:
         container.pack(expand=True, fill="both", padx=20, pady=20)
 
         # Title
-        tk.Label(container, text="Developed By", font=(THEME["font_main"], 12),
+        tk.Label(container, text="Developed By", font=self.font(12),
                  fg=THEME["fg_sub"], bg=THEME["bg"]).pack(pady=(10, 5))
 
         # Name
-        tk.Label(container, text="Mahir Siam", font=(THEME["font_main"], 24, "bold"),
+        tk.Label(container, text="Mahir Siam", font=self.font(24, "bold"),
                  fg=THEME["accent"], bg=THEME["bg"]).pack(pady=5)
 
         # Tagline
         tk.Label(container, text="MERN Stack Developer |\nC++ Problem Solver", 
-                 font=(THEME["font_main"], 12), fg=THEME["fg"], bg=THEME["bg"],
+                 font=self.font(12), fg=THEME["fg"], bg=THEME["bg"],
                  justify="center").pack(pady=10)
 
         # Bio / Description
         bio = ("Dedicated to bringing creative ideas to life\n"
                "through robust code and interactive applications.")
-        tk.Label(container, text=bio, font=(THEME["font_main"], 10, "italic"),
+        tk.Label(container, text=bio, font=self.font(10, "italic"),
                  fg=THEME["fg_sub"], bg=THEME["bg"], justify="center").pack(pady=10)
 
         # GitHub Button
-        gh_btn = tk.Button(container, text="Visit GitHub Profile", font=(THEME["font_main"], 12, "bold"),
+        gh_btn = tk.Button(container, text="Visit GitHub Profile", font=self.font(12, "bold"),
                            bg=THEME["input_bg"], fg="#FFFFFF", activebackground=THEME["accent"],
                            relief="flat", width=20, cursor="hand2",
-                           command=lambda: webbrowser.open("https://github.com/mahirsiam2004"))
+                           command=self.open_github)
         gh_btn.pack(pady=20)
 
         # Close
-        tk.Button(container, text="Close", font=(THEME["font_main"], 10),
+        tk.Button(container, text="Close", font=self.font(10),
                   bg=THEME["bg"], fg=THEME["fg_sub"], relief="flat",
                   cursor="hand2", command=dev.destroy).pack(side="bottom", pady=10)
 
+    def open_github(self):
+        import webbrowser  # only needed here; keeps it off the startup path
+        webbrowser.open("https://github.com/mahirsiam2004")
+
 
 # ---------- RUN ----------
 if __name__ == "__main__":
@@ -723,6 +1340,10 @@ if __name__ == "__main__":
     # Handle Close
     def on_closing():
         app.is_running = False
+        if app.api is not None:
+            app.api.stop()
+        app.engine.stop() # flushes pending writes
+        app.audio.close()
         root.destroy()
         sys.exit(0)
         
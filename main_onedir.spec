@@ -0,0 +1,54 @@
+# -*- mode: python ; coding: utf-8 -*-
+# Fast-start profile: onedir (no unpacking to a temp dir on every launch),
+# no UPX (no decompression at load) and unused stdlib packages left out.
+# Build: pyinstaller main_onedir.spec  ->  dist/FocusBell/FocusBell.exe
+
+
+a = Analysis(
+    ['main.py'],
+    pathex=[],
+    binaries=[],
+    datas=[('alarm.wav', '.')],
+    hiddenimports=[],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=[
+        'unittest', 'doctest', 'pydoc', 'pydoc_data', 'pdb',
+        'lib2to3', 'distutils', 'setuptools', 'pip',
+        'email', 'http', 'xmlrpc', 'xml', 'ftplib',
+        'tkinter.test', 'test', 'idlelib', 'turtle', 'turtledemo',
+    ],
+    noarchive=False,
+    optimize=1,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='FocusBell',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=False,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    icon=['app_icon.ico'],
+)
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='FocusBell',
+)
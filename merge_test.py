@@ -0,0 +1,168 @@
+"""Checks the three-way merge of external edits to tasks.json (engine.merge_external).
+
+Headless and synchronous (no background writer) except for the exit check.
+Covers a change made on one side only, the same alarm changed on both
+sides, edit against delete in both directions, a save that finds an edit
+the watcher has not reported yet (merged, then written back), and the same
+at exit while the UI thread is stuck in stop(). Fails with an
+AssertionError on the first mismatch.
+Run: python merge_test.py
+"""
+import json
+import os
+import queue
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+from engine import FocusBellEngine
+
+
+class Harness:
+    def __init__(self, names=("a", "b", "c"), background_writes=False):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "tasks.json")
+        with open(os.path.join(self.tmp, "settings.json"), "w") as f:
+            json.dump({"watch_file": True, "background_writes": background_writes,
+                       "archive_after_days": None}, f)
+        self.engine = FocusBellEngine(self.path, os.path.join(self.tmp, "settings.json"))
+        self.engine.load()
+        # Merges are driven by hand (or by a stale save); the watcher would race them
+        self.engine.start_watching()
+        self.engine.watcher.stop()
+        self.engine.watcher = None
+        when = datetime.now() + timedelta(hours=1)
+        self.alarms = {name: self.engine.add_alarm(name, when) for name in names}
+        self.summaries = []
+        self.engine.on_external_change = self.summaries.append
+
+    def edit_file(self, edit):
+        """Rewrites tasks.json as another program would; edit(items by name) mutates them."""
+        with open(self.path) as f:
+            items = {item["task_name"]: item for item in json.load(f)}
+        edit(items)
+        with open(self.path, "w") as f:
+            json.dump(list(items.values()), f)
+
+    def diverge(self, ours, theirs):
+        """Applies ours() to the engine and theirs(items by name) to the file, from the same base."""
+        base = {alarm_id: dict(item) for alarm_id, item in self.engine.store.synced.items()}
+        ours()
+        items = {item["task_name"]: dict(item) for item in base.values()}
+        theirs(items)
+        with open(self.path, "w") as f:
+            json.dump(list(items.values()), f)
+        self.engine.store.synced = base
+
+    def merge(self):
+        items, signature = self.engine.store.read_external()
+        return self.engine.merge_external(items, signature)
+
+    def on_disk(self):
+        with open(self.path) as f:
+            return sorted(item["task_name"] for item in json.load(f))
+
+    def in_memory(self):
+        return sorted(a.task_name for a in self.engine.alarms)
+
+    def rename(self, name, new):
+        alarm = self.alarms[name]
+        return lambda: self.engine.update_alarm(alarm, new, alarm.alarm_time, alarm.priority)
+
+    def stop(self):
+        self.engine.stop()
+
+
+def rename(old, new):
+    def edit(items):
+        items[old]["task_name"] = new
+    return edit
+
+
+def delete(name):
+    def edit(items):
+        del items[name]
+    return edit
+
+
+def check_one_side():
+    h = Harness()
+    # Theirs only: an edit, a new task and a delete are all taken
+    def edit(items):
+        items["a"]["task_name"] = "a outside"
+        items["new"] = dict(items["b"], id="new-id", task_name="new")
+        del items["c"]
+    h.edit_file(edit)
+    summary = h.merge()
+    assert summary == {"added": 1, "updated": 1, "removed": 1, "conflicts": 0}, summary
+    assert h.in_memory() == ["a outside", "b", "new"], h.in_memory()
+    assert h.summaries == [summary]
+
+    # Ours only (on a different alarm than theirs): both kept, nothing to resolve
+    h.diverge(h.rename("b", "b inside"), rename("new", "new outside"))
+    summary = h.merge()
+    assert summary == {"added": 0, "updated": 1, "removed": 0, "conflicts": 0}, summary
+    assert h.in_memory() == ["a outside", "b inside", "new outside"], h.in_memory()
+    h.stop()
+
+
+def check_both_changed():
+    h = Harness()
+    h.diverge(h.rename("a", "a inside"), rename("a", "a outside"))
+    summary = h.merge()
+    assert summary == {"added": 0, "updated": 0, "removed": 0, "conflicts": 1}, summary
+    # The running app wins and the file converges on it
+    assert h.in_memory() == ["a inside", "b", "c"], h.in_memory()
+    assert h.on_disk() == h.in_memory(), h.on_disk()
+    h.stop()
+
+
+def check_edit_vs_delete():
+    # We edit, they delete: the edit wins and is written back
+    h = Harness()
+    h.diverge(h.rename("a", "a inside"), delete("a"))
+    summary = h.merge()
+    assert summary == {"added": 0, "updated": 0, "removed": 0, "conflicts": 1}, summary
+    assert h.in_memory() == ["a inside", "b", "c"] and h.on_disk() == h.in_memory(), h.on_disk()
+    h.stop()
+
+    # We delete, they edit: the edit brings it back
+    h = Harness()
+    h.diverge(lambda: h.engine.delete_alarm(h.alarms["a"]), rename("a", "a outside"))
+    summary = h.merge()
+    assert summary == {"added": 1, "updated": 0, "removed": 0, "conflicts": 1}, summary
+    assert h.in_memory() == ["a outside", "b", "c"] and h.on_disk() == h.in_memory(), h.on_disk()
+    h.stop()
+
+
+def check_resave():
+    # An external edit the watcher hasn't reported when our next save comes
+    h = Harness()
+    h.edit_file(rename("a", "a outside"))
+    h.engine.add_alarm("d", datetime.now() + timedelta(hours=2))
+    assert len(h.summaries) == 1 and h.summaries[0]["updated"] == 1, h.summaries
+    assert h.in_memory() == ["a outside", "b", "c", "d"], h.in_memory()
+    # Merged, then written back: the file holds both sides and is our base again
+    assert h.on_disk() == h.in_memory(), h.on_disk()
+    assert h.engine.store.read_external()[1] == h.engine.store.signature
+    h.stop()
+
+
+def check_exit():
+    # The writer finds the edit during stop()'s flush; the UI loop is no longer running
+    h = Harness(background_writes=True)
+    h.engine.flush()
+    h.engine.dispatch = queue.Queue().put
+    h.edit_file(rename("a", "a outside"))
+    h.engine.add_alarm("d", datetime.now() + timedelta(hours=2))
+    stopping = threading.Thread(target=h.stop, daemon=True)
+    stopping.start()
+    stopping.join(5)
+    assert not stopping.is_alive(), "stop() deadlocked on the held-back merge"
+    assert h.on_disk() == ["a outside", "b", "c", "d"], h.on_disk()
+
+
+if __name__ == "__main__":
+    for check in (check_one_side, check_both_changed, check_edit_vs_delete, check_resave, check_exit):
+        check()
+        print(f"{check.__name__}: OK")
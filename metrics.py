@@ -0,0 +1,149 @@
+"""Low-overhead timing instrumentation.
+
+Every observation goes into a per-metric histogram and a fixed-size ring
+buffer of recent samples. When disabled, observe() returns after a single
+attribute check and timed()/timer() call straight through, so the hooks can stay
+in the hot paths permanently.
+
+Metrics recorded by the app (all in milliseconds):
+  trigger_lateness   - due time to the checker handing the alarm over
+  ui_lateness        - due time to the trigger window running on the Tk loop
+  trigger_window     - building/refreshing the trigger window
+  load_tasks         - reading the task store
+  save_tasks         - one write (full save or commit) by the store
+  show_dashboard     - showing and refreshing the dashboard
+  search             - dashboard search/filter keystroke to results shown
+  first_paint        - process start to the first dashboard frame
+  time_to_sound      - audio play() call to the sound reaching the device
+  clock_jump         - size of a detected wall-clock jump or suspend
+"""
+from collections import deque
+import bisect
+from contextlib import contextmanager
+import functools
+import json
+import os
+import threading
+import time
+
+# Upper bounds (ms) of the histogram buckets; one more bucket catches the rest
+BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+RING_SIZE = 1024
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+
+class Metrics:
+    def __init__(self, enabled=False, ring_size=RING_SIZE):
+        self.enabled = enabled
+        self.histograms = {}
+        self.recent = deque(maxlen=ring_size)   # (epoch seconds, name, ms)
+        self._lock = threading.Lock()
+
+    def observe(self, name, value_ms):
+        if not self.enabled:
+            return
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram()
+            hist.add(value_ms)
+            self.recent.append((time.time(), name, value_ms))
+
+    def observe_lateness(self, name, alarms, now=None):
+        """Records how far past its due time each alarm is at `now`."""
+        if not self.enabled:
+            return
+        now = time.time() if now is None else now
+        for alarm in alarms:
+            self.observe(name, max(0.0, (now - alarm.due) * 1000))
+
+    def timed(self, name):
+        """Decorator recording the wrapped call's duration under `name`."""
+        def wrap(fn):
+            @functools.wraps(fn)
+            def inner(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(name, (time.perf_counter() - start) * 1000)
+            return inner
+        return wrap
+
+    @contextmanager
+    def timer(self, name):
+        """Context manager form of timed()."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000)
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.recent.clear()
+
+    # ========== EXPORT ==========
+    def snapshot(self):
+        with self._lock:
+            histograms = {
+                name: {
+                    "buckets": {str(b): c for b, c in zip(BUCKETS + ("+Inf",), hist.counts)},
+                    "count": hist.count,
+                    "sum_ms": round(hist.total, 3),
+                    "max_ms": round(hist.max, 3),
+                }
+                for name, hist in sorted(self.histograms.items())
+            }
+            recent = [{"t": round(t, 3), "name": name, "ms": round(ms, 3)} for t, name, ms in self.recent]
+        return {"enabled": self.enabled, "histograms": histograms, "recent": recent}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            for name, hist in sorted(self.histograms.items()):
+                metric = f"focusbell_{name}_ms"
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ("+Inf",), hist.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f"{metric}_sum {hist.total:.3f}")
+                lines.append(f"{metric}_count {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """Writes Prometheus text for .prom/.txt paths, JSON otherwise."""
+        ext = os.path.splitext(path)[1].lower()
+        text = self.to_prometheus() if ext in (".prom", ".txt") else self.to_json()
+        with open(path, "w") as f:
+            f.write(text)
+
+
+# Shared by the engine, the storage writer and the UI
+METRICS = Metrics(enabled=bool(os.environ.get("FOCUSBELL_METRICS")))
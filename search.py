@@ -0,0 +1,142 @@
+"""Incremental search index over the task list.
+
+Task names are split into lowercase word tokens. Each token maps to the ids
+that contain it, and a sorted token list answers prefix queries with a
+bisect. Priority and active state are kept as id buckets. The engine calls
+update()/remove() for every change it persists, so a query never rescans
+the alarm list.
+"""
+import bisect
+import re
+
+TOKEN_RE = re.compile(r"\w+")
+STATUS_FILTERS = ("all", "active", "completed")
+
+
+def tokenize(text):
+    return set(TOKEN_RE.findall(text.lower()))
+
+
+class TaskIndex:
+    def __init__(self):
+        self.alarms = {}        # id -> Alarm
+        self.indexed = {}       # id -> (task_name, prio, active) as last indexed
+        self.postings = {}      # token -> set of ids
+        self.tokens = []        # sorted keys of postings, for prefix ranges
+        self.by_priority = {}   # prio -> set of ids
+        self.active = set()
+        self.completed = set()
+
+    def rebuild(self, alarms):
+        self.__init__()
+        for alarm in alarms:
+            self.update(alarm)
+
+    def update(self, alarm):
+        """Indexes a new alarm or re-indexes a changed one."""
+        old = self.indexed.get(alarm.id)
+        state = (alarm.task_name, alarm.prio, alarm.active)
+        self.alarms[alarm.id] = alarm
+        if old == state:
+            return
+        if old is None or old[0] != alarm.task_name:
+            if old is not None:
+                self._drop_tokens(alarm.id, old[0])
+            for token in tokenize(alarm.task_name):
+                ids = self.postings.get(token)
+                if ids is None:
+                    ids = self.postings[token] = set()
+                    bisect.insort(self.tokens, token)
+                ids.add(alarm.id)
+        if old is not None:
+            self.by_priority[old[1]].discard(alarm.id)
+        self.by_priority.setdefault(alarm.prio, set()).add(alarm.id)
+        if alarm.active:
+            self.active.add(alarm.id)
+            self.completed.discard(alarm.id)
+        else:
+            self.completed.add(alarm.id)
+            self.active.discard(alarm.id)
+        self.indexed[alarm.id] = state
+
+    def remove(self, alarm_id):
+        old = self.indexed.pop(alarm_id, None)
+        if old is None:
+            return
+        del self.alarms[alarm_id]
+        self._drop_tokens(alarm_id, old[0])
+        self.by_priority[old[1]].discard(alarm_id)
+        self.active.discard(alarm_id)
+        self.completed.discard(alarm_id)
+
+    def _drop_tokens(self, alarm_id, task_name):
+        for token in tokenize(task_name):
+            ids = self.postings.get(token)
+            if ids is None:
+                continue
+            ids.discard(alarm_id)
+            if not ids:
+                del self.postings[token]
+                del self.tokens[bisect.bisect_left(self.tokens, token)]
+
+    def prefix_ids(self, prefix):
+        """Ids of alarms with any token starting with prefix."""
+        ids = set()
+        i = bisect.bisect_left(self.tokens, prefix)
+        while i < len(self.tokens) and self.tokens[i].startswith(prefix):
+            ids |= self.postings[self.tokens[i]]
+            i += 1
+        return ids
+
+    def search(self, text="", prio=None, status="all"):
+        """Ids matching every word of text (as prefixes) and the filters (a new set)."""
+        sets = []
+        if prio is not None:
+            sets.append(self.by_priority.get(prio, set()))
+        if status == "active":
+            sets.append(self.active)
+        elif status == "completed":
+            sets.append(self.completed)
+        for term in sorted(tokenize(text), key=len, reverse=True):
+            # Longest terms first: they are the most selective
+            ids = self.prefix_ids(term)
+            if not ids:
+                return set()
+            sets.append(ids)
+        if not sets:
+            return set(self.alarms)
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:])
+
+
+class SearchResults:
+    """Matches in dashboard order, found only as far as they are read.
+
+    Holds a snapshot of the ordered list and the matching ids, so len() is
+    immediate and showing the first screen of a broad match only scans a few
+    rows instead of filtering the whole list.
+    """
+
+    def __init__(self, ordered, ids, start=0, stop=None):
+        self.ordered = ordered
+        self.ids = ids
+        self.matches = []
+        self.scanned = start  # only ordered[start:stop] can hold matches
+        self.stop = len(ordered) if stop is None else stop
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self.ids)
+        while len(self.matches) <= i and self.scanned < self.stop:
+            alarm = self.ordered[self.scanned]
+            self.scanned += 1
+            if alarm.id in self.ids:
+                self.matches.append(alarm)
+        return self.matches[i]
+
+    def __iter__(self):
+        for i in range(len(self.ids)):
+            yield self[i]
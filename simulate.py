@@ -0,0 +1,270 @@
+"""Replays days of alarms against a virtual clock, headless and faster than real time.
+
+Generates a tasks.json (one-shot alarms spread over the simulated span plus
+some recurring ones) and loads it into an engine running on a
+clock.FakeClock. The script then acts as the checker thread: it polls the
+scheduler and, where the checker would sleep, advances the virtual clock
+by the delay the scheduler asked for. A simulated user snoozes a share of
+the one-shot triggers and adds tasks by 12h clock time, which exercises the
+"tomorrow" rollover. --suspend puts the machine to sleep mid-run so the
+catch-up policy is exercised too.
+
+Reports fired counts, ordering violations and virtual lateness (fire time
+minus due time, so 0 unless a suspend made alarms late), plus real
+throughput. Exits with an AssertionError if an alarm fired early, out of
+order, twice, or not at all.
+Run: python simulate.py [--alarms 100000] [--days 1] [--snooze 0.1]
+                        [--suspend HOURS@HOUR] [--catch-up all|newest|summarize]
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from clock import FakeClock
+from engine import (CATCH_UP_POLICIES, FocusBellEngine, alarm_time_from_clock, next_occurrence,
+                    trigger_key)
+
+START = datetime(2026, 1, 5)  # a Monday, local midnight
+
+
+def percentiles(samples):
+    if not samples:
+        return None
+    samples = sorted(samples)
+    pick = lambda q: round(samples[min(len(samples) - 1, int(q * len(samples)))], 3)
+    return {"min": pick(0), "median": pick(0.5), "p99": pick(0.99), "max": pick(1)}
+
+
+def make_tasks(path, count, recurring, start, end, seed):
+    """Writes count one-shot and `recurring` repeating tasks due in (start, end]."""
+    rng = random.Random(seed)
+    span = int(end - start)
+    tasks = []
+    for i in range(count):
+        due = datetime.fromtimestamp(start + rng.randint(1, span))
+        tasks.append({"id": f"a{i}", "task_name": f"task {i}", "alarm_time": due.isoformat(),
+                      "active": True, "priority": rng.choice(["High", "Medium", "Low"])})
+    now = datetime.fromtimestamp(start)
+    for i in range(recurring):
+        if i % 2:
+            rule = {"kind": "hours", "every": rng.randint(1, 6),
+                    "anchor": (now + timedelta(minutes=rng.randint(1, 59))).isoformat()}
+        else:
+            rule = {"kind": "daily", "at": f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}"}
+        tasks.append({"id": f"r{i}", "task_name": f"routine {i}", "active": True, "priority": "Medium",
+                      "alarm_time": next_occurrence(rule, now).isoformat(), "recurrence": rule})
+    with open(path, "w") as f:
+        json.dump(tasks, f)
+
+
+def occurrences(rule, start, end):
+    """How many times a recurring alarm should fire in (start, end]."""
+    count = 0
+    t = next_occurrence(rule, datetime.fromtimestamp(start))
+    while t.timestamp() <= end:
+        count += 1
+        t = next_occurrence(rule, t)
+    return count
+
+
+class Simulation:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed + 1)
+        self.start = START.timestamp()
+        self.end = self.start + args.days * 86400
+
+        tmp = tempfile.mkdtemp(prefix="focusbell-sim-")
+        self.data_file = os.path.join(tmp, "tasks.json")
+        self.settings_file = os.path.join(tmp, "settings.json")
+        make_tasks(self.data_file, args.alarms, args.recurring, self.start, self.end, args.seed)
+        with open(self.settings_file, "w") as f:
+            json.dump({"storage": args.storage, "catch_up": args.catch_up, "watch_file": False,
+                       "archive_after_days": None}, f)
+
+        self.clock = FakeClock(self.start)
+        self.engine = FocusBellEngine(self.data_file, self.settings_file, clock=self.clock)
+        self.engine.on_trigger = self.on_trigger
+        self.engine.on_catch_up = self.on_catch_up
+
+        self.fired = Counter()      # alarm id -> times rung
+        self.expected = Counter()   # alarm id -> times it should ring by the end
+        self.occurrences = {}       # recurring alarm id -> occurrences in the span
+        self.skipped = 0            # handled by the catch-up policy without ringing
+        self.lateness = []          # virtual seconds, per ring
+        self.batches = 0
+        self.largest_batch = 0
+        self.snoozed = 0
+        self.added = 0
+        self.last_fire = self.start
+        self.early = []
+        self.out_of_order = 0
+        self.bad_rollovers = 0
+
+    # ========== SIMULATED USER ==========
+    def on_trigger(self, ring):
+        now = self.clock.time()
+        if now < self.last_fire or ring != sorted(ring, key=trigger_key):
+            self.out_of_order += 1
+        self.last_fire = now
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(ring))
+
+        # What the trigger window does first, so a repeat can't ring again
+        fired = self.engine.mark_fired(ring)
+        for alarm in fired:
+            self.fired[alarm.id] += 1
+            # mark_fired has moved recurring alarms on to their next occurrence
+            if alarm.recurrence:
+                self.expect_next(alarm)
+            else:
+                self.lateness.append(now - alarm.due)
+                if alarm.due > now:
+                    self.early.append(alarm.id)
+
+        snooze = [a for a in fired if not a.recurrence and self.rng.random() < self.args.snooze]
+        if snooze:
+            self.engine.snooze_alarms(snooze)
+            self.snoozed += len(snooze)
+            for alarm in snooze:
+                if alarm.due <= self.end:
+                    self.expected[alarm.id] += 1
+
+        if self.added < self.args.adds and self.rng.random() < self.args.adds / max(1, self.args.alarms):
+            self.add_by_clock()
+
+    def add_by_clock(self):
+        """Adds a task the way the editor does: a 12h clock time, tomorrow if it has passed."""
+        now = self.clock.now()
+        hour, minute, ampm = self.rng.randint(1, 12), self.rng.randint(0, 59), self.rng.choice(["AM", "PM"])
+        when = alarm_time_from_clock(hour, minute, ampm, now)
+        if not now < when <= now + timedelta(days=1):
+            self.bad_rollovers += 1
+        alarm = self.engine.add_alarm(f"added {self.added}", when, "Low")
+        self.added += 1
+        if alarm.due <= self.end:
+            self.expected[alarm.id] += 1
+
+    def on_catch_up(self, alarms):
+        self.skipped += len(alarms)
+        for alarm in alarms:
+            self.expected[alarm.id] -= 1
+            if alarm.recurrence:
+                self.expect_next(alarm)
+
+    def expect_next(self, alarm):
+        # A recurring alarm rings again if its next occurrence is inside the span
+        if alarm.due <= self.end:
+            self.expected[alarm.id] += 1
+
+    # ========== CHECKER ==========
+    def run(self):
+        args = self.args
+        load_start = time.perf_counter()
+        self.engine.load()
+        load_ms = (time.perf_counter() - load_start) * 1000
+        for alarm in self.engine.alarms:
+            if alarm.recurrence:
+                self.occurrences[alarm.id] = occurrences(alarm.recurrence, self.start, self.end)
+            if alarm.due <= self.end:
+                self.expected[alarm.id] += 1
+
+        suspend_at = self.start + args.suspend[1] * 3600 if args.suspend else None
+        polls = 0
+        start = time.perf_counter()
+        while True:
+            due, delay = self.engine.scheduler.poll()
+            polls += 1
+            if due:
+                self.engine.handle_due(due)
+                continue
+            now = self.clock.time()
+            if suspend_at is not None and now >= suspend_at:
+                self.clock.suspend(args.suspend[0] * 3600)
+                suspend_at = None
+                continue
+            if delay is None or now >= self.end:
+                break
+            # The checker's sleep, in virtual time
+            step = min(delay, self.end - now)
+            if suspend_at is not None:
+                step = min(step, suspend_at - now)
+            self.clock.advance(step)
+        elapsed = time.perf_counter() - start
+        self.engine.stop()
+        return self.report(load_ms, elapsed, polls)
+
+    def report(self, load_ms, elapsed, polls):
+        rung = sum(self.fired.values())
+        missing = sum(max(0, n - self.fired[i]) for i, n in self.expected.items())
+        repeated = sum(max(0, n - self.expected[i]) for i, n in self.fired.items())
+        virtual = self.clock.time() - self.start
+        # Occurrences a suspend folded into one catch-up; 0 without clock jumps
+        collapsed = sum(n - self.fired[i] for i, n in self.occurrences.items())
+        return {
+            "alarms": self.args.alarms + self.args.recurring,
+            "simulated_hours": round(virtual / 3600, 2),
+            "real_s": round(elapsed, 3),
+            "load_ms": round(load_ms, 1),
+            "speedup": round(virtual / elapsed) if elapsed else None,
+            "rung": rung,
+            "rung_per_s": round(rung / elapsed) if elapsed else None,
+            "batches": self.batches,
+            "largest_batch": self.largest_batch,
+            "polls": polls,
+            "snoozed": self.snoozed,
+            "added": self.added,
+            "caught_up_silently": self.skipped,
+            "recurring_collapsed": collapsed,
+            "clock_jumps": self.engine.scheduler.jumps,
+            "lateness_s": percentiles(self.lateness),
+            "missing": missing,
+            "repeated": repeated,
+            "early": len(self.early),
+            "out_of_order_batches": self.out_of_order,
+            "bad_rollovers": self.bad_rollovers,
+        }
+
+
+def check(report):
+    assert report["early"] == 0, "alarms fired before they were due"
+    assert report["out_of_order_batches"] == 0, "triggers out of order"
+    assert report["repeated"] == 0, "alarms fired more often than scheduled"
+    assert report["missing"] == 0, "alarms never fired"
+    assert report["bad_rollovers"] == 0, "clock-time rollover outside the next 24h"
+    if report["clock_jumps"] == 0:
+        assert report["recurring_collapsed"] == 0, "recurring occurrences skipped"
+
+
+def parse_suspend(text):
+    hours, _, at = text.partition("@")
+    return float(hours), float(at or 12)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--alarms", type=int, default=100000, help="one-shot alarms")
+    parser.add_argument("--recurring", type=int, default=1000)
+    parser.add_argument("--days", type=float, default=1)
+    parser.add_argument("--snooze", type=float, default=0.1, help="share of one-shot triggers snoozed")
+    parser.add_argument("--adds", type=int, default=1000, help="tasks the user adds by clock time")
+    parser.add_argument("--suspend", type=parse_suspend, metavar="HOURS@HOUR",
+                        help="sleep for HOURS starting HOUR hours into the run")
+    parser.add_argument("--catch-up", default="all", choices=CATCH_UP_POLICIES)
+    parser.add_argument("--storage", default="journal", choices=["json", "journal", "sqlite"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    report = Simulation(args).run()
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    check(report)
+    print("OK")
@@ -0,0 +1,591 @@
+"""Task storage backends for the engine.
+
+Every backend exposes the same surface:
+  load()                  -> list of alarm dicts (Alarm.to_dict format)
+  save(alarms)            full rewrite
+  commit(get_alarms, changes)
+                          persist a batch of (op, alarm) changes; get_alarms()
+                          returns the full list and is only called if needed
+  close()                 flush anything pending
+and optionally iter_load() to stream items (file order; SQLite: dashboard order),
+and sync_deadline()/sync() for stores that batch fsync (the BackgroundWriter
+calls sync() once the deadline passes, even if no further change arrives).
+"""
+import threading
+import time
+import os
+import json
+
+from metrics import METRICS
+
+STORE_KINDS = ("json", "journal", "sqlite")
+
+# Rows per keyset query when SqliteStore streams a load
+PAGE_SIZE = 5000
+
+# ========== PLAIN JSON ==========
+def file_signature(path):
+    """(mtime, size, inode) of path, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class JsonStore:
+    """The original format: the whole list rewritten on every change.
+
+    Remembers what the file held after its last load or save (synced, by
+    id) and the file's signature then, so external edits can be told apart
+    from our own writes and merged three-way (see engine.merge_external).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.synced = {}
+        self.signature = None
+        self.on_stale = None   # on_stale(items, signature): save() found an unmerged external edit
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'r') as f:
+            data = json.load(f)
+        self.mark_synced(data)
+        return data
+
+    def iter_load(self):
+        if not os.path.exists(self.path):
+            return
+        self.signature = file_signature(self.path)
+        synced = {}
+        with open(self.path, 'r') as f:
+            for item in iter_json_array(f):
+                if isinstance(item, dict) and "id" in item:
+                    synced[item["id"]] = item
+                yield item
+        self.synced = synced
+
+    def read_external(self):
+        """Parses the file as someone else left it; returns (items, signature)."""
+        signature = file_signature(self.path)
+        with open(self.path, 'r') as f:
+            return json.load(f), signature
+
+    def mark_synced(self, data, signature=None):
+        self.synced = {item["id"]: item for item in data if isinstance(item, dict) and "id" in item}
+        self.signature = signature or file_signature(self.path)
+
+    def save(self, alarms):
+        if self.on_stale and file_signature(self.path) != self.signature:
+            # Changed since our last load/save and not merged yet: writing now would lose
+            # that edit, so hand it over for merging (which saves again) instead
+            try:
+                items, signature = self.read_external()
+            except (OSError, ValueError) as e:
+                print(f"Error reading changed tasks: {e}")
+            else:
+                self.on_stale(items, signature)
+                return
+        data = [alarm.to_dict() for alarm in alarms]
+        # Swap a finished file in, so the watcher never reads a half-written one
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp_path, self.path)
+        self.mark_synced(data)
+
+    def commit(self, get_alarms, changes):
+        self.save(get_alarms())
+
+    def close(self):
+        pass
+
+
+def iter_json_array(f, chunk_size=1 << 16):
+    """Yields the items of a top-level JSON array, reading the file in chunks."""
+    decoder = json.JSONDecoder()
+    buf = f.read(chunk_size)
+    pos = len(buf) - len(buf.lstrip())
+    if buf[pos:pos + 1] != "[":
+        raise ValueError("Expected a JSON array")
+    pos += 1
+
+    while True:
+        # Skip whitespace and separators, refilling as needed
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf):
+                break
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise ValueError("Unterminated JSON array")
+            buf, pos = chunk, 0
+
+        if buf[pos] == "]":
+            return
+
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except ValueError:
+            # Item straddles the chunk boundary
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+
+        yield item
+        pos = end
+        if pos > chunk_size:
+            buf, pos = buf[pos:], 0
+
+
+def write_snapshot(path, data):
+    # Write to a temp file and swap it in, so a crash never leaves a truncated file
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+# ========== APPEND-ONLY JOURNAL ==========
+def torn_tail(path):
+    """True if path is non-empty and doesn't end with a newline (a crash mid-append)."""
+    with open(path, 'rb') as f:
+        if f.seek(0, os.SEEK_END) == 0:
+            return False
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b"\n"
+
+
+class JournalStore:
+    """Snapshot plus an append-only journal of change records.
+
+    The snapshot is a regular tasks.json. Each change appends one JSON line
+    to <path>.journal; fsync is batched, at most FSYNC_INTERVAL late. Once the journal grows past
+    COMPACT_AFTER records it is rotated to <path>.journal.old and folded
+    into a new snapshot on a background thread. Loading replays snapshot,
+    then the old journal (if a compaction was interrupted), then the
+    current journal; records are full-state upserts, so replay is idempotent.
+    """
+    FSYNC_BATCH = 32        # records
+    FSYNC_INTERVAL = 1.0    # seconds
+    COMPACT_AFTER = 500     # records
+
+    def __init__(self, path):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.old_journal_path = path + ".journal.old"
+
+        self._journal = None
+        self._records = 0           # records in the current journal
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._compactor = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        items = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                for item in json.load(f):
+                    items[item.get("id")] = item
+
+        for journal_path in (self.old_journal_path, self.journal_path):
+            count = self._replay(journal_path, items)
+            if journal_path == self.journal_path:
+                self._records = count
+        return list(items.values())
+
+    def _replay(self, journal_path, items):
+        if not os.path.exists(journal_path):
+            return 0
+        count = 0
+        with open(journal_path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn final line from a crash mid-append
+                    print(f"Skipping bad journal record in {journal_path}")
+                    continue
+                if record["op"] == "delete":
+                    items.pop(record["id"], None)
+                else:
+                    items[record["id"]] = record["alarm"]
+                count += 1
+        return count
+
+    def _open_journal(self):
+        if self._journal is None:
+            self._journal = open(self.journal_path, 'a')
+            if torn_tail(self.journal_path):
+                # Start after a line torn by a crash, or the next record is lost with it
+                self._journal.write("\n")
+        return self._journal
+
+    def save(self, alarms):
+        # A full save is just an immediate compaction
+        self.wait_compaction()
+        with self._lock:
+            self._rotate()
+        self._compact([alarm.to_dict() for alarm in alarms])
+
+    def commit(self, get_alarms, changes):
+        journal = self._open_journal()
+        for op, alarm in changes:
+            record = {"op": op, "id": alarm.id}
+            if op != "delete":
+                record["alarm"] = alarm.to_dict()
+            journal.write(json.dumps(record) + "\n")
+        journal.flush()
+
+        self._records += len(changes)
+        self._unsynced += len(changes)
+        now = time.monotonic()
+        if self._unsynced >= self.FSYNC_BATCH or now - self._last_sync >= self.FSYNC_INTERVAL:
+            self._sync()
+
+        if self._records >= self.COMPACT_AFTER and not self.compacting():
+            self.start_compaction(get_alarms())
+
+    def sync_deadline(self):
+        """Monotonic time by which unsynced records are due for fsync (None if there are none)."""
+        return self._last_sync + self.FSYNC_INTERVAL if self._unsynced else None
+
+    def sync(self):
+        self._sync()
+
+    def _sync(self):
+        if self._journal is not None and self._unsynced:
+            os.fsync(self._journal.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _rotate(self):
+        # Everything journaled so far is covered by the snapshot about to be written
+        self._sync()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if not os.path.exists(self.journal_path):
+            pass
+        elif os.path.exists(self.old_journal_path):
+            # A previous compaction never finished; keep its records too
+            torn = torn_tail(self.old_journal_path)
+            with open(self.journal_path, 'r') as src, open(self.old_journal_path, 'a') as dst:
+                dst.write("\n" * torn + src.read())
+            os.remove(self.journal_path)
+        else:
+            os.replace(self.journal_path, self.old_journal_path)
+        self._records = 0
+
+    def compacting(self):
+        return self._compactor is not None and self._compactor.is_alive()
+
+    def start_compaction(self, alarms):
+        if self.compacting():
+            return
+        # Capture the state on the caller's thread; only the disk write runs in the background
+        data = [alarm.to_dict() for alarm in alarms]
+        with self._lock:
+            self._rotate()
+        self._compactor = threading.Thread(target=self._compact, args=(data,), daemon=True)
+        self._compactor.start()
+
+    def _compact(self, data):
+        try:
+            write_snapshot(self.path, data)
+            if os.path.exists(self.old_journal_path):
+                os.remove(self.old_journal_path)
+        except Exception as e:
+            print(f"Error compacting tasks: {e}")
+
+    def wait_compaction(self):
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+
+    def close(self):
+        self.wait_compaction()
+        self._sync()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+# ========== SQLITE ==========
+class SqliteStore:
+    """One row per alarm in <name>.db, indexed for the scheduler and dashboard.
+
+    alarm_time is stored as ISO text, which sorts chronologically. Single
+    edits are one indexed upsert/delete. On first open an existing
+    tasks.json is migrated in.
+
+    The engine does not query this backend beyond loading: iter_load() pages
+    through the (active, alarm_time, id) index so the first page it shows
+    and schedules is the soonest-due alarms, and every row is then loaded.
+    "Next due" comes from the engine's in-memory heap and dashboard
+    filtering from its search index, as with the other backends. The
+    priority index is there for ad hoc queries on the file.
+    """
+
+    def __init__(self, path, json_path=None):
+        self.path = path
+        self.json_path = json_path
+        self._lock = threading.Lock()
+        import sqlite3  # only paid for when this backend is selected
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS alarms ("
+                " id TEXT PRIMARY KEY,"
+                " task_name TEXT NOT NULL,"
+                " alarm_time TEXT NOT NULL,"
+                " active INTEGER NOT NULL,"
+                " priority TEXT NOT NULL DEFAULT 'Medium',"
+                " recurrence TEXT)")
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(alarms)")]
+            if "recurrence" not in columns:
+                self._db.execute("ALTER TABLE alarms ADD COLUMN recurrence TEXT")
+            # id breaks ties between equal due times for keyset paging (see page())
+            self._db.execute("DROP INDEX IF EXISTS alarms_due")
+            self._db.execute("CREATE INDEX IF NOT EXISTS alarms_active_due ON alarms (active, alarm_time, id)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS alarms_priority ON alarms (priority)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.migrate_from_json()
+
+    def _row(self, data):
+        recurrence = data.get("recurrence")
+        return (data["id"], data["task_name"], data["alarm_time"],
+                1 if data["active"] else 0, data.get("priority", "Medium"),
+                json.dumps(recurrence) if recurrence else None)
+
+    def _dict(self, row):
+        data = dict(row)
+        data["active"] = bool(data["active"])
+        recurrence = data.pop("recurrence")
+        if recurrence:
+            data["recurrence"] = json.loads(recurrence)
+        return data
+
+    def migrate_from_json(self):
+        """Imports tasks.json once, the first time the database is opened."""
+        done = self._db.execute("SELECT value FROM meta WHERE key = 'migrated_json'").fetchone()
+        if done or not self.json_path or not os.path.exists(self.json_path):
+            return
+        try:
+            data = JsonStore(self.json_path).load()
+        except Exception as e:
+            print(f"Error migrating tasks: {e}")
+            return
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO alarms VALUES (?, ?, ?, ?, ?, ?)",
+                                 [self._row(item) for item in data if item.get("id")])
+            self._db.execute("INSERT INTO meta VALUES ('migrated_json', ?)", (self.json_path,))
+
+    def load(self):
+        with self._lock:
+            rows = self._db.execute("SELECT * FROM alarms ORDER BY alarm_time").fetchall()
+        return [self._dict(row) for row in rows]
+
+    def save(self, alarms):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM alarms")
+            self._db.executemany("INSERT INTO alarms VALUES (?, ?, ?, ?, ?, ?)",
+                                 [self._row(alarm.to_dict()) for alarm in alarms])
+
+    def commit(self, get_alarms, changes):
+        # One transaction per batch; each change is a single indexed row operation
+        with self._lock, self._db:
+            for op, alarm in changes:
+                if op == "delete":
+                    self._db.execute("DELETE FROM alarms WHERE id = ?", (alarm.id,))
+                else:
+                    self._db.execute("INSERT OR REPLACE INTO alarms VALUES (?, ?, ?, ?, ?, ?)",
+                                     self._row(alarm.to_dict()))
+
+    # ----- Indexed queries -----
+    def page(self, active, limit, after=None):
+        """Up to limit alarms with the given active flag in (alarm_time, id) order,
+        starting after the (alarm_time, id) key given (keyset paging)."""
+        with self._lock:
+            if after is None:
+                rows = self._db.execute(
+                    "SELECT * FROM alarms WHERE active = ? ORDER BY alarm_time, id LIMIT ?",
+                    (active, limit)).fetchall()
+            else:
+                rows = self._db.execute(
+                    "SELECT * FROM alarms WHERE active = ? AND (alarm_time, id) > (?, ?)"
+                    " ORDER BY alarm_time, id LIMIT ?", (active, *after, limit)).fetchall()
+        return [self._dict(row) for row in rows]
+
+    def iter_load(self, page_size=PAGE_SIZE):
+        """Streams rows in dashboard order (active by time, then completed) off the index,
+        so the engine's first page is the soonest-due alarms."""
+        for active in (1, 0):
+            after = None
+            while True:
+                rows = self.page(active, page_size, after)
+                yield from rows
+                if len(rows) < page_size:
+                    break
+                after = (rows[-1]["alarm_time"], rows[-1]["id"])
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+# ========== BACKGROUND WRITER ==========
+class BackgroundWriter:
+    """Runs store writes on a dedicated thread so callers never wait on disk.
+
+    Mutations mark the writer dirty; it waits DEBOUNCE seconds for more to
+    arrive, then writes everything pending in one commit. Several changes to
+    the same alarm collapse to the latest one.
+    """
+    DEBOUNCE = 0.25   # seconds
+
+    def __init__(self, store, get_alarms, write_settings, paused=False):
+        self.store = store
+        self.get_alarms = get_alarms
+        self.write_settings = write_settings
+
+        self._pending = {}          # alarm.id -> (op, alarm), insertion ordered
+        self._jobs = []             # other disk work (archive appends), run before the next write
+        self._full_save = False
+        self._settings_dirty = False
+        self._writing = False
+        self._flushing = 0
+        self._paused = paused       # hold writes until the alarm list is complete
+        self._running = True
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _dirty(self):
+        return bool(self._pending) or self._full_save or self._settings_dirty or bool(self._jobs)
+
+    def submit(self, changes):
+        with self._cond:
+            for op, alarm in changes:
+                self._pending.pop(alarm.id, None)
+                self._pending[alarm.id] = (op, alarm)
+            self._cond.notify_all()
+
+    def submit_full(self):
+        with self._cond:
+            self._full_save = True
+            self._pending = {}
+            self._cond.notify_all()
+
+    def submit_job(self, job):
+        """Runs job() on the writer thread, ahead of the changes submitted after it."""
+        with self._cond:
+            self._jobs.append(job)
+            self._cond.notify_all()
+
+    def submit_settings(self):
+        with self._cond:
+            self._settings_dirty = True
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and (self._paused or not self._dirty()):
+                    wait = None if self._paused else self._sync_wait()
+                    if wait == 0:
+                        break
+                    self._cond.wait(wait)
+                if not self._dirty():
+                    if not self._running:
+                        return
+                    # Idle, but the last records of a burst are still waiting for fsync
+                    self._sync_store()
+                    continue
+                # Debounce: let a burst of mutations pile up
+                deadline = time.monotonic() + self.DEBOUNCE
+                while self._running and not self._flushing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                changes = list(self._pending.values())
+                full_save = self._full_save
+                settings_dirty = self._settings_dirty
+                jobs = self._jobs
+                self._jobs = []
+                self._pending = {}
+                self._full_save = False
+                self._settings_dirty = False
+                self._writing = True
+
+            for job in jobs:
+                try:
+                    job()
+                except Exception as e:
+                    print(f"Error in background write: {e}")
+            try:
+                if full_save or changes:
+                    with METRICS.timer("save_tasks"):
+                        if full_save:
+                            self.store.save(self.get_alarms())
+                        else:
+                            self.store.commit(self.get_alarms, changes)
+                if settings_dirty:
+                    self.write_settings()
+            except Exception as e:
+                print(f"Error saving tasks: {e}")
+
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+    def _sync_wait(self):
+        # Seconds until the store's batched fsync is due; None if nothing is waiting
+        deadline = self.store.sync_deadline() if hasattr(self.store, "sync_deadline") else None
+        return None if deadline is None else max(0, deadline - time.monotonic())
+
+    def _sync_store(self):
+        try:
+            self.store.sync()
+        except Exception as e:
+            print(f"Error syncing tasks: {e}")
+
+    def resume(self):
+        with self._cond:
+            self._paused = False
+            self._cond.notify_all()
+
+    def flush(self):
+        """Blocks until everything submitted so far is on disk."""
+        with self._cond:
+            if self._paused:
+                return
+            self._flushing += 1
+            self._cond.notify_all()
+            while self._dirty() or self._writing:
+                self._cond.wait()
+            self._flushing -= 1
+
+    def close(self):
+        with self._cond:
+            self._running = False
+            self._paused = False
+            self._cond.notify_all()
+        self._thread.join()
+
+
+def make_store(kind, path):
+    if kind == "journal":
+        return JournalStore(path)
+    if kind == "sqlite":
+        return SqliteStore(os.path.splitext(path)[0] + ".db", json_path=path)
+    return JsonStore(path)
@@ -0,0 +1,110 @@
+"""Hammers the engine with mutations from several threads while the checker runs.
+
+Headless (no tkinter/winsound). Checks that a repeated trigger is dropped,
+that no alarm fires more often than it was scheduled, and that the saved
+file, the history archive and the search index match memory at the end.
+Run: python stress_test.py
+"""
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from engine import FocusBellEngine
+
+THREADS = 4
+OPS_PER_THREAD = 2000
+
+fired = Counter()
+scheduled = Counter()
+count_lock = threading.Lock()
+duplicates = []
+
+def on_trigger(due):
+    accepted = engine.mark_fired(due)
+    # Deliver every trigger twice; the repeat must be dropped
+    duplicates.extend(engine.mark_fired(due))
+    with count_lock:
+        for alarm in accepted:
+            fired[alarm.id] += 1
+
+def worker(seed):
+    rng = random.Random(seed)
+    for _ in range(OPS_PER_THREAD):
+        soon = datetime.now() + timedelta(milliseconds=rng.randint(-500, 1500))
+        op = rng.random()
+        with engine.lock:
+            alarms = list(engine.alarms)
+        if op < 0.4 or not alarms:
+            alarm = engine.add_alarm(f"task {rng.randint(0, 999)}", soon, rng.choice(["High", "Medium", "Low"]))
+            with count_lock:
+                scheduled[alarm.id] += 1
+        elif op < 0.6:
+            alarm = rng.choice(alarms)
+            with count_lock:
+                scheduled[alarm.id] += 1
+            engine.update_alarm(alarm, "edited", soon, "Low")
+        elif op < 0.75:
+            alarm = rng.choice(alarms)
+            with count_lock:
+                scheduled[alarm.id] += 1
+            engine.snooze_alarm(alarm, 0)
+        elif op < 0.9:
+            engine.delete_alarm(rng.choice(alarms))
+        elif op < 0.95:
+            engine.complete_alarm(rng.choice(alarms))
+        else:
+            engine.clear_completed()
+
+if __name__ == "__main__":
+    tmp = tempfile.mkdtemp()
+    engine = FocusBellEngine(os.path.join(tmp, "tasks.json"), os.path.join(tmp, "settings.json"))
+    engine.load()
+
+    engine.on_trigger = on_trigger
+    engine.start()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    time.sleep(2)  # let the last alarms fall due
+    engine.stop()
+
+    assert not duplicates, f"Repeated trigger accepted: {[a.id for a in duplicates[:5]]}"
+    overfired = [alarm_id for alarm_id, count in fired.items() if count > scheduled[alarm_id]]
+    assert not overfired, f"Alarms fired more often than scheduled: {overfired[:5]}"
+
+    with open(engine.data_file) as f:
+        on_disk = {item["id"]: item for item in json.load(f)}
+    in_memory = {a.id: a.to_dict() for a in engine.alarms}
+    assert on_disk == in_memory, "Saved tasks differ from memory"
+
+    # Cleared tasks move to the history archive instead of being lost
+    archived = {a.id: a for month in engine.history_months() for a in engine.load_history(month)}
+    assert not set(archived) & set(on_disk), "Archived tasks left in the task file"
+    assert not any(a.active for a in archived.values()), "Active task archived"
+
+    # The incrementally maintained search index must agree with a full scan
+    for text, priority, status in [("", None, "all"), ("task 1", None, "all"), ("edit", "Low", "active"),
+                                   ("", "High", "completed")]:
+        found = {a.id for a in engine.search(text, priority, status)}
+        words = text.split()
+        expected = {a.id for a in engine.alarms
+                    if all(any(w.startswith(t) for w in a.task_name.lower().split()) for t in words)
+                    and (priority is None or a.priority == priority)
+                    and (status == "all" or a.active == (status == "active"))}
+        assert found == expected, f"Search index out of date for {(text, priority, status)}"
+    # Completing or deleting an alarm another thread already deleted must not resurrect it
+    assert set(engine.index.alarms) == set(in_memory), "Search index holds deleted alarms"
+
+    print(f"{THREADS * OPS_PER_THREAD} mutations in {elapsed:.2f}s, "
+          f"{sum(fired.values())} triggers, {len(in_memory)} alarms left, {len(archived)} archived: OK")
@@ -1,6 +1,13 @@
 import tkinter
-import winsound
 import threading
 import datetime
+import engine
+import metrics
+import audio
+import search
+import clock
+import archive
+import watcher
+import api
 
 print("Modules imported successfully")
@@ -0,0 +1,260 @@
+"""Bulk import/export of alarms as CSV or iCalendar (.ics).
+
+Parsing streams the file and yields Alarms in chunks, so a large import
+never holds more than one chunk of raw rows at a time. CSV chunks can
+optionally be converted in a process pool. Nothing here touches the UI;
+the caller commits the result once (see FocusBellEngine.import_alarms).
+"""
+from datetime import datetime, timezone
+import csv
+import itertools
+import json
+import os
+
+from engine import Alarm, make_recurrence
+
+CHUNK_SIZE = 5000
+CSV_FIELDS = ["id", "task_name", "alarm_time", "active", "priority", "recurrence"]
+
+
+def file_format(path):
+    return "ics" if os.path.splitext(path)[1].lower() in (".ics", ".ical") else "csv"
+
+
+def chunked(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+# ========== CSV ==========
+def csv_row_to_dict(row):
+    """Normalizes one CSV row to Alarm.to_dict form (None if unusable)."""
+    name = (row.get("task_name") or "").strip()
+    when = (row.get("alarm_time") or "").strip()
+    if not name or not when:
+        return None
+    try:
+        alarm_time = datetime.fromisoformat(when.replace(" ", "T", 1))
+    except ValueError:
+        return None
+    if alarm_time.tzinfo is not None:
+        alarm_time = alarm_time.astimezone().replace(tzinfo=None)
+
+    active = (row.get("active") or "true").strip().lower() not in ("false", "0", "no")
+    data = {
+        "id": (row.get("id") or "").strip() or None,
+        "task_name": name,
+        "alarm_time": alarm_time.isoformat(),
+        "active": active,
+        "priority": (row.get("priority") or "Medium").strip().capitalize(),
+    }
+    recurrence = (row.get("recurrence") or "").strip()
+    if recurrence:
+        # Rebuilt through make_recurrence so a malformed rule imports as one-shot
+        try:
+            rule = json.loads(recurrence)
+            data["recurrence"] = make_recurrence(rule.get("kind"), alarm_time, rule.get("every"), rule.get("days"))
+        except (ValueError, TypeError, AttributeError):
+            pass
+    return data
+
+
+def _convert_rows(rows):
+    # Top-level so it can run in a worker process
+    return [data for data in map(csv_row_to_dict, rows) if data]
+
+
+def iter_csv(path, chunk_size=CHUNK_SIZE, workers=0):
+    """Yields lists of Alarms, one per chunk of CSV rows.
+
+    With workers > 1 the row conversion runs in a process pool; rows are
+    still read sequentially, so memory stays bounded to a few chunks.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        chunks = chunked(csv.DictReader(f), chunk_size)
+        if workers > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(workers) as pool:
+                for dicts in pool.map(_convert_rows, chunks):
+                    yield [a for a in map(Alarm.from_dict, dicts) if a]
+        else:
+            for rows in chunks:
+                yield [a for a in map(Alarm.from_dict, _convert_rows(rows)) if a]
+
+
+def export_csv(alarms, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for alarm in alarms:
+            data = alarm.to_dict()
+            if "recurrence" in data:
+                data["recurrence"] = json.dumps(data["recurrence"])
+            writer.writerow(data)
+
+# ========== ICALENDAR ==========
+ICS_DAYS = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+
+
+def iter_ics_lines(f):
+    """Unfolds continuation lines (RFC 5545 3.1)."""
+    current = None
+    for line in f:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def unescape_ics(text):
+    return (text.replace("\\n", " ").replace("\\N", " ").replace("\\,", ",")
+            .replace("\\;", ";").replace("\\\\", "\\"))
+
+
+def parse_ics_time(value, params):
+    if "VALUE=DATE" in params and len(value) == 8:
+        return datetime.strptime(value, "%Y%m%d")
+    if value.endswith("Z"):
+        utc = datetime.strptime(value, "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+        return utc.astimezone().replace(tzinfo=None)
+    # Floating or TZID times are taken as local
+    return datetime.strptime(value, "%Y%m%dT%H%M%S")
+
+
+def rrule_to_recurrence(rrule, alarm_time):
+    """Repeat rule for an RRULE, built and checked by make_recurrence (ValueError if invalid)."""
+    parts = dict(p.split("=", 1) for p in rrule.split(";") if "=" in p)
+    freq = parts.get("FREQ")
+    interval = parts.get("INTERVAL", "1")
+    if freq == "DAILY" and interval == "1":
+        return make_recurrence("daily", alarm_time)
+    if freq == "HOURLY":
+        return make_recurrence("hours", alarm_time, every=interval)
+    if freq == "WEEKLY" and interval == "1":
+        byday = parts.get("BYDAY")
+        days = sorted(ICS_DAYS.index(d[-2:]) for d in byday.split(",")) if byday else [alarm_time.weekday()]
+        if days == [0, 1, 2, 3, 4]:
+            return make_recurrence("weekdays", alarm_time)
+        return make_recurrence("days", alarm_time, days=days)
+    return None  # Unsupported rules import as one-shot
+
+
+def ics_priority(value):
+    # RFC 5545: 1-4 high, 5 medium, 6-9 low, 0 undefined
+    try:
+        level = int(value)
+    except ValueError:
+        return "Medium"
+    if 1 <= level <= 4:
+        return "High"
+    if level >= 6:
+        return "Low"
+    return "Medium"
+
+
+def iter_ics_events(f):
+    event = None
+    for line in iter_ics_lines(f):
+        if line == "BEGIN:VEVENT":
+            event = {}
+        elif line == "END:VEVENT":
+            if event is not None:
+                yield event
+            event = None
+        elif event is not None and ":" in line:
+            name, value = line.split(":", 1)
+            name, _, params = name.partition(";")
+            event[name.upper()] = (value, params.upper())
+
+
+def ics_event_to_alarm(event):
+    if "DTSTART" not in event or "SUMMARY" not in event:
+        return None
+    try:
+        alarm_time = parse_ics_time(*event["DTSTART"])
+    except ValueError:
+        return None
+    recurrence = None
+    if "RRULE" in event:
+        try:
+            recurrence = rrule_to_recurrence(event["RRULE"][0], alarm_time)
+        except ValueError:
+            pass # Invalid rules (INTERVAL=0, unknown days) import as one-shot
+    status = event.get("STATUS", ("", ""))[0].upper()
+    return Alarm(
+        task_name=unescape_ics(event["SUMMARY"][0]).strip(),
+        alarm_time=alarm_time,
+        active=status not in ("COMPLETED", "CANCELLED"),
+        id=event.get("UID", (None, ""))[0],
+        priority=ics_priority(event.get("PRIORITY", ("0", ""))[0]),
+        recurrence=recurrence,
+    )
+
+
+def iter_ics(path, chunk_size=CHUNK_SIZE):
+    with open(path, encoding="utf-8-sig") as f:
+        for events in chunked(iter_ics_events(f), chunk_size):
+            yield [a for a in map(ics_event_to_alarm, events) if a]
+
+
+def escape_ics(text):
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def recurrence_to_rrule(rule):
+    if rule["kind"] == "daily":
+        return "FREQ=DAILY"
+    if rule["kind"] == "hours":
+        return f"FREQ=HOURLY;INTERVAL={rule['every']}"
+    days = [0, 1, 2, 3, 4] if rule["kind"] == "weekdays" else rule["days"]
+    return "FREQ=WEEKLY;BYDAY=" + ",".join(ICS_DAYS[d] for d in days)
+
+
+def export_ics(alarms, path):
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    prio_levels = {"High": 1, "Medium": 5, "Low": 9}
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//FocusBell//EN\r\n")
+        for alarm in alarms:
+            lines = [
+                "BEGIN:VEVENT",
+                f"UID:{alarm.id}",
+                f"DTSTAMP:{stamp}",
+                f"DTSTART:{alarm.alarm_time.strftime('%Y%m%dT%H%M%S')}",
+                f"SUMMARY:{escape_ics(alarm.task_name)}",
+                f"PRIORITY:{prio_levels[alarm.priority]}",
+            ]
+            if not alarm.active:
+                lines.append("STATUS:COMPLETED")
+            if alarm.recurrence:
+                lines.append(f"RRULE:{recurrence_to_rrule(alarm.recurrence)}")
+            lines.append("END:VEVENT")
+            f.write("\r\n".join(lines) + "\r\n")
+        f.write("END:VCALENDAR\r\n")
+
+# ========== ENTRY POINTS ==========
+def read_alarms(path, chunk_size=CHUNK_SIZE, workers=0):
+    """Parses a CSV or .ics file into a list of Alarms, chunk by chunk."""
+    if file_format(path) == "ics":
+        chunks = iter_ics(path, chunk_size)
+    else:
+        chunks = iter_csv(path, chunk_size, workers)
+    alarms = []
+    for chunk in chunks:
+        alarms.extend(chunk)
+    return alarms
+
+
+def write_alarms(alarms, path):
+    if file_format(path) == "ics":
+        export_ics(alarms, path)
+    else:
+        export_csv(alarms, path)
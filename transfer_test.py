@@ -0,0 +1,140 @@
+"""Checks CSV and iCalendar import/export (transfer.py) end to end, headless.
+
+Round-trips one alarm of every repeat kind through both formats, then
+imports files with malformed rows and rules: bad repeat rules must come in
+as one-shot alarms and bad rows must be skipped, never crash the import,
+and past one-shot events come in completed. Fails with an AssertionError
+on the first mismatch.
+Run: python transfer_test.py
+"""
+import csv
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import transfer
+from engine import Alarm, FocusBellEngine, make_recurrence
+
+TOMORROW = (datetime.now() + timedelta(days=1)).replace(hour=9, minute=30, second=0, microsecond=0)
+PAST = TOMORROW - timedelta(days=3)
+
+
+def new_engine():
+    tmp = tempfile.mkdtemp()
+    with open(os.path.join(tmp, "settings.json"), "w") as f:
+        json.dump({"watch_file": False, "background_writes": False, "archive_after_days": None}, f)
+    engine = FocusBellEngine(os.path.join(tmp, "tasks.json"), os.path.join(tmp, "settings.json"))
+    engine.load()
+    return engine, tmp
+
+
+def sample_alarms():
+    alarms = [
+        Alarm("one-shot, with \"quotes\", commas; and semicolons", TOMORROW, priority="High"),
+        Alarm("completed", PAST, active=False, priority="Low"),
+    ]
+    for kind, days in (("daily", None), ("weekdays", None), ("days", [1, 3, 6]), ("hours", None)):
+        rule = make_recurrence(kind, TOMORROW, every=2, days=days)
+        alarms.append(Alarm(f"repeat {kind}", TOMORROW, recurrence=rule))
+    return alarms
+
+
+def fields(alarm):
+    return (alarm.id, alarm.task_name, alarm.due, alarm.active, alarm.priority, alarm.recurrence)
+
+
+def check_round_trip():
+    alarms = sample_alarms()
+    tmp = tempfile.mkdtemp()
+    for name in ("tasks.csv", "tasks.ics"):
+        path = os.path.join(tmp, name)
+        transfer.write_alarms(alarms, path)
+        back = transfer.read_alarms(path)
+        assert [fields(a) for a in back] == [fields(a) for a in alarms], (name, [fields(a) for a in back])
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(transfer.CSV_FIELDS)
+        writer.writerows(rows)
+
+
+def import_into_engine(path):
+    """Imports path and renders what the dashboard would; returns the engine's alarms by name."""
+    engine, _ = new_engine()
+    counts = engine.import_alarms(transfer.read_alarms(path))
+    for alarm in engine.alarms:
+        alarm.get_repeat_str()
+        alarm.get_remaining_str()
+    by_name = {a.task_name: a for a in engine.alarms}
+    engine.stop()
+    return by_name, counts
+
+
+def check_malformed_csv():
+    when = TOMORROW.isoformat()
+    rows = [
+        ["", "no kind", when, "true", "High", '{"kind": "daily"}'],   # rebuilt from alarm_time
+        ["", "a number", when, "true", "High", "5"],
+        ["", "day 7", when, "true", "High", '{"kind": "days", "days": [7]}'],
+        ["", "no days", when, "true", "High", '{"kind": "days", "days": []}'],
+        ["", "every 0", when, "true", "High", '{"kind": "hours", "every": 0}'],
+        ["", "every text", when, "true", "High", '{"kind": "hours", "every": "x"}'],
+        ["", "unknown kind", when, "true", "High", '{"kind": "monthly"}'],
+        ["", "not json", when, "true", "High", "{daily"],
+        ["", "bad date", "tomorrow", "true", "High", ""],
+        ["", "", when, "true", "High", ""],
+        ["", "past", PAST.isoformat(), "true", "High", ""],
+    ]
+    path = os.path.join(tempfile.mkdtemp(), "bad.csv")
+    write_csv(path, rows)
+    by_name, counts = import_into_engine(path)
+    assert sorted(by_name) == sorted(r[1] for r in rows[:8] + rows[10:]), sorted(by_name)
+    assert by_name["no kind"].recurrence == {"kind": "daily", "at": "09:30"}
+    one_shot = ["a number", "day 7", "no days", "every 0", "every text", "unknown kind", "not json"]
+    assert all(by_name[name].recurrence is None and by_name[name].active for name in one_shot)
+    assert not by_name["past"].active and counts == (9, 0, 1), counts
+
+
+def write_ics(path, events):
+    stamp = TOMORROW.strftime("%Y%m%dT%H%M%S")
+    with open(path, "w", newline="") as f:
+        f.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\n")
+        for i, (name, extra) in enumerate(events):
+            f.write(f"BEGIN:VEVENT\r\nUID:ev{i}\r\nSUMMARY:{name}\r\n")
+            if extra is not None:
+                f.write(f"DTSTART:{stamp}\r\n" + "".join(line + "\r\n" for line in extra))
+            f.write("END:VEVENT\r\n")
+        f.write("END:VCALENDAR\r\n")
+
+
+def check_malformed_ics():
+    events = [
+        ("interval 0", ["RRULE:FREQ=HOURLY;INTERVAL=0"]),
+        ("interval -1", ["RRULE:FREQ=HOURLY;INTERVAL=-1"]),
+        ("interval text", ["RRULE:FREQ=HOURLY;INTERVAL=two"]),
+        ("bad day", ["RRULE:FREQ=WEEKLY;BYDAY=MO,XX"]),
+        ("monthly", ["RRULE:FREQ=MONTHLY"]),
+        ("every 3h", ["RRULE:FREQ=HOURLY;INTERVAL=3"]),
+        ("bad priority", ["PRIORITY:high"]),
+        ("no start", None),
+    ]
+    path = os.path.join(tempfile.mkdtemp(), "bad.ics")
+    write_ics(path, events)
+    with open(path, "a") as f:
+        f.write("BEGIN:VEVENT\r\nSUMMARY:bad time\r\nDTSTART:2025-13-45\r\nEND:VEVENT\r\n")
+    by_name, counts = import_into_engine(path)
+    assert sorted(by_name) == sorted(name for name, extra in events if extra is not None), sorted(by_name)
+    for name in ("interval 0", "interval -1", "interval text", "bad day", "monthly"):
+        assert by_name[name].recurrence is None and by_name[name].active, name
+    assert by_name["every 3h"].recurrence["every"] == 3
+    assert by_name["bad priority"].priority == "Medium"
+    assert counts == (7, 0, 0), counts
+
+
+if __name__ == "__main__":
+    for check in (check_round_trip, check_malformed_csv, check_malformed_ics):
+        check()
+        print(f"{check.__name__}: OK")
@@ -0,0 +1,114 @@
+"""Notices when a file is changed by someone else.
+
+On Linux the file's directory is watched with inotify (through ctypes, no
+extra dependency), which also catches editors and sync tools that replace
+the file instead of writing it in place. Elsewhere, or if inotify is not
+available, the file's (mtime, size, inode) signature is polled.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+
+from storage import file_signature
+
+POLL_INTERVAL = 1.0   # seconds, polling fallback
+SETTLE = 0.1          # wait for a burst of events to finish before reading
+
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def open_inotify(directory):
+    """Returns an inotify fd watching directory, or None if unsupported."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+
+class FileWatcher:
+    """Calls on_change(signature) from its own thread when path changes."""
+
+    def __init__(self, path, on_change, poll_interval=POLL_INTERVAL):
+        self.path = os.path.abspath(path)
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.known = file_signature(self.path)
+        self.mode = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        fd = open_inotify(os.path.dirname(self.path))
+        self.mode = "inotify" if fd is not None else "poll"
+        target = self._run_inotify if fd is not None else self._run_poll
+        self._thread = threading.Thread(target=target, args=(fd,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def check(self):
+        """Fires on_change if the file differs from the last known state."""
+        signature = file_signature(self.path)
+        with self._lock:
+            if signature == self.known:
+                return
+            self.known = signature
+        if signature is not None:
+            self.on_change(signature)
+
+    def _run_poll(self, _fd):
+        while not self._stop.wait(self.poll_interval):
+            self.check()
+
+    def _run_inotify(self, fd):
+        name = os.fsencode(os.path.basename(self.path))
+        try:
+            while not self._stop.is_set():
+                ready, _, _ = select.select([fd], [], [], self.poll_interval)
+                if not ready:
+                    continue
+                if name in self._read_names(fd):
+                    # Let the writer finish, then drain what it produced
+                    self._stop.wait(SETTLE)
+                    self._read_names(fd)
+                    self.check()
+        finally:
+            os.close(fd)
+
+    def _read_names(self, fd):
+        names = set()
+        try:
+            data = os.read(fd, 64 * 1024)
+        except BlockingIOError:
+            return names
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _wd, _mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            names.add(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+        return names